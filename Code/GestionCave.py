@@ -1,8 +1,16 @@
-from datetime import date
+import hashlib
+import json
+import uuid
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 
+from requetes import registre
+
 # Modèles métier et accès base pour la gestion d'une cave à vin.
-# Chaque classe gère ses opérations CRUD principales via un curseur MySQL fourni (self.conn).
+# Chaque classe gère ses opérations CRUD principales via la connexion fournie (self.conn, MySQL ou SQLite);
+# les requêtes SQL sont nommées et préparées une fois par connexion dans requetes.py.
+
+ALLOWED_TYPES = ["Rouge", "Blanc", "Rosé", "Champagne"]  # Types de vins acceptés
 
 
 class Utilisateur:
@@ -17,9 +25,7 @@ class Utilisateur:
     def trouver_par_identifiants(self):
         # Retourne un utilisateur si la combinaison nom/prénom/mdp existe.
         # Utilisé lors de la connexion (/login) pour authentifier et charger l'utilisateur en session.
-        cur = self.conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM utilisateur WHERE nom=%s AND prenom=%s AND mot_de_passe=%s", (self.nom, self.prenom, self.mot_de_passe))
-        row = cur.fetchone()
+        row = registre.ligne(self.conn, "utilisateur.par_identifiants", (self.nom, self.prenom, self.mot_de_passe))
         if row:
             return Utilisateur(row["nom"], row["prenom"], row["mot_de_passe"], row["id"], self.conn)
         return None
@@ -27,8 +33,7 @@ class Utilisateur:
     def sauvegarder(self):
         # Insère l'utilisateur et met à jour son id.
         # Utilisé lors de l'inscription (/register) pour créer un nouveau compte.
-        cur = self.conn.cursor()
-        cur.execute("INSERT INTO utilisateur (nom, prenom, mot_de_passe) VALUES (%s, %s, %s)", (self.nom, self.prenom, self.mot_de_passe))
+        cur = registre.executer(self.conn, "utilisateur.inserer", (self.nom, self.prenom, self.mot_de_passe))
         self.id_utilisateur = cur.lastrowid
         return self.id_utilisateur
 
@@ -44,35 +49,64 @@ class Cave:
     def sauvegarder(self):
         # Crée une cave et renvoie son identifiant.
         # Utilisé par /caves/creer après validation pour créer la cave d'un utilisateur.
-        cur = self.conn.cursor()
-        cur.execute("INSERT INTO cave (nom, id_utilisateur) VALUES (%s, %s)", (self.nom, self.utilisateur_id))
+        cur = registre.executer(self.conn, "cave.inserer", (self.nom, self.utilisateur_id))
         self.id_cave = cur.lastrowid
         return self.id_cave
 
-    def obtenir_par_utilisateur(self, user_id: int) -> List["Cave"]:
-        # Liste les caves d'un utilisateur donné.
-        # Utilisé par /caves/mes pour afficher les caves de l'utilisateur connecté.
-        cur = self.conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM cave WHERE id_utilisateur=%s", (user_id,))
-        return [Cave(row["nom"], row["id_utilisateur"], row["id"], self.conn) for row in cur.fetchall()]
-
-    def obtenir_toutes(self) -> List["Cave"]:
-        # Liste toutes les caves (exploration publique).
-        # Utilisé par /caves/explorer pour lister les caves de l'utilisateur connecté et celles des autres.
-        cur = self.conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM cave")
-        return [Cave(row["nom"], row["id_utilisateur"], row["id"], self.conn) for row in cur.fetchall()]
-
     def trouver_par_id(self, cave_id: int):
         # Récupère une cave par son identifiant.
         # Utilisé pour vérifier la propriété d'une cave.
-        cur = self.conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM cave WHERE id=%s", (cave_id,))
-        row = cur.fetchone()
+        row = registre.ligne(self.conn, "cave.par_id", (cave_id,))
         if row:
             return Cave(row["nom"], row["id_utilisateur"], row["id"], self.conn)
         return None
 
+    def obtenir_apercu_par_utilisateur(self, user_id: int) -> List["ApercuCave"]:
+        # Liste les caves d'un utilisateur avec leurs indicateurs, en une seule requête groupée.
+        # Utilisé par /caves/mes pour afficher les cartes des caves (bouteilles, étagères, remplissage, valeur).
+        rows = registre.lignes(self.conn, "cave.apercu_par_utilisateur", (user_id, user_id, user_id))
+        return [ApercuCave.depuis_row(row, self.conn) for row in rows]
+
+    def obtenir_apercu_toutes(self) -> List["ApercuCave"]:
+        # Liste toutes les caves avec leurs indicateurs, en une seule requête groupée.
+        # Utilisé par /caves/explorer; le nombre de requêtes ne dépend pas du nombre de caves.
+        rows = registre.lignes(self.conn, "cave.apercu_toutes")
+        return [ApercuCave.depuis_row(row, self.conn) for row in rows]
+
+
+class ApercuCave(Cave):
+    # Cave accompagnée de ses indicateurs agrégés (étagères, capacité, bouteilles, valeur des prix).
+    def __init__(self, nom: str, utilisateur_id: int, nb_etageres: int = 0, capacite_totale: int = 0, nb_bouteilles: int = 0, valeur_totale: float = 0.0, id_cave: Optional[int] = None, conn=None):
+        super().__init__(nom, utilisateur_id, id_cave, conn)
+        self.nb_etageres = nb_etageres
+        self.capacite_totale = capacite_totale
+        self.nb_bouteilles = nb_bouteilles
+        self.valeur_totale = valeur_totale
+
+    @staticmethod
+    def depuis_row(row, conn=None) -> "ApercuCave":
+        return ApercuCave(row["nom"], row["id_utilisateur"], int(row["nb_etageres"]), int(row["capacite_totale"]), int(row["nb_bouteilles"]), float(row["valeur_totale"]), row["id"], conn)
+
+    @property
+    def taux_remplissage(self) -> Optional[float]:
+        # Part de la capacité occupée (0 à 1), None si la cave n'a pas d'étagère.
+        if not self.capacite_totale:
+            return None
+        return self.nb_bouteilles / self.capacite_totale
+
+    def en_dict(self) -> dict:
+        # Représentation JSON (API /api/v1/caves).
+        return {
+            "id": self.id_cave,
+            "nom": self.nom,
+            "utilisateur_id": self.utilisateur_id,
+            "nb_etageres": self.nb_etageres,
+            "capacite_totale": self.capacite_totale,
+            "nb_bouteilles": self.nb_bouteilles,
+            "taux_remplissage": self.taux_remplissage,
+            "valeur_totale": self.valeur_totale,
+        }
+
 
 class Etagere:
     # Étagère (nom, capacité) appartenant à une cave.
@@ -86,15 +120,13 @@ class Etagere:
     def obtenir_par_cave(self, cave_id: int) -> List["Etagere"]:
         # Retourne les étagères d'une cave.
         # Utilisé par la page détail de cave pour afficher les étagères et remplir les listes déroulantes.
-        cur = self.conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM etagere WHERE id_cave=%s", (cave_id,))
-        return [Etagere(row["nom"], row["capacite"], row["id_cave"], row["id"], self.conn) for row in cur.fetchall()]
+        rows = registre.lignes(self.conn, "etagere.par_cave", (cave_id,))
+        return [Etagere(row["nom"], row["capacite"], row["id_cave"], row["id"], self.conn) for row in rows]
 
     def sauvegarder(self):
         # Crée une étagère et renvoie son identifiant.
         # Utilisé par /etagere/creer pour créer une étagère avec une capacité de stockage dans la cave.
-        cur = self.conn.cursor()
-        cur.execute("INSERT INTO etagere (nom, capacite, id_cave) VALUES (%s, %s, %s)", (self.nom, self.capacite, self.cave_id))
+        cur = registre.executer(self.conn, "etagere.inserer", (self.nom, self.capacite, self.cave_id))
         self.id_etagere = cur.lastrowid
         return self.id_etagere
 
@@ -103,44 +135,35 @@ class Etagere:
         # Utilisé par /etagere/supprimer pour permettre la suppression d'une etagère mais uniquement si l'étagère ne contient aucune bouteille.
         if self.compter_bouteilles_par_etagere(self.conn, self.id_etagere) > 0:
             return False
-        cur = self.conn.cursor()
-        cur.execute("DELETE FROM etagere WHERE id=%s", (self.id_etagere,))
+        registre.executer(self.conn, "etagere.supprimer", (self.id_etagere,))
         return True
 
     @staticmethod
     def compter_par_cave(conn, cave_id: int) -> int:
         # Compte le nombre d'étagères dans une cave.
         # Utilisé avant l'ajout de bouteilles pour s'assurer qu'au moins une étagère existe.
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM etagere WHERE id_cave=%s", (cave_id,))
-        row = cur.fetchone()
-        return int(row[0]) if row else 0
+        row = registre.ligne(conn, "etagere.compter_par_cave", (cave_id,))
+        return int(row["nb"]) if row else 0
 
     @staticmethod
     def verifier_existe_dans_cave(conn, etagere_id: int, cave_id: int) -> bool:
         # Vérifie qu'une étagère existe et appartient à la cave donnée.
         # Utilisé lors de l'ajout de bouteilles pour valider l'étagère sélectionnée.
-        cur = conn.cursor()
-        cur.execute("SELECT id FROM etagere WHERE id=%s AND id_cave=%s", (etagere_id, cave_id))
-        return cur.fetchone() is not None
+        return registre.ligne(conn, "etagere.existe_dans_cave", (etagere_id, cave_id)) is not None
 
     @staticmethod
     def obtenir_capacite(conn, etagere_id: int) -> Optional[int]:
         # Récupère la capacité d'une étagère.
         # Utilisé pour contrôler la capacité avant d'ajouter des bouteilles.
-        cur = conn.cursor()
-        cur.execute("SELECT capacite FROM etagere WHERE id=%s", (etagere_id,))
-        row = cur.fetchone()
-        return int(row[0]) if row and row[0] else None
+        row = registre.ligne(conn, "etagere.capacite", (etagere_id,))
+        return int(row["capacite"]) if row and row["capacite"] else None
 
     @staticmethod
     def compter_bouteilles_par_etagere(conn, etagere_id: int) -> int:
         # Compte le nombre de bouteilles sur une étagère donnée.
         # Utilisé pour empêcher d'ajouter des bouteilles au-delà de la capacité de l'étagère.
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM bouteille_cave WHERE id_etagere=%s", (etagere_id,))
-        row = cur.fetchone()
-        return int(row[0]) if row else 0
+        row = registre.ligne(conn, "etagere.compter_bouteilles", (etagere_id,))
+        return int(row["nb"]) if row else 0
 
 
 class Bouteille:
@@ -159,9 +182,8 @@ class Bouteille:
     def sauvegarder(self):
         # Insère la bouteille dans le référentiel et met à jour son id.
         # Utilisé lors de l'ajout; crée la définition de la bouteille (métadonnées) avant placement en cave.
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO bouteille (domaine_viticole, nom, type, annee, region, photo_etiquette, prix) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+        cur = registre.executer(
+            self.conn, "bouteille.inserer",
             (self.domaine_viticole, self.nom, self.type, self.annee, self.region, self.photo_etiquette, self.prix),
         )
         self.id_bouteille = cur.lastrowid
@@ -178,77 +200,65 @@ class BouteilleCave(Bouteille):
     def sauvegarder(self):
         # Lie la bouteille référentielle à une étagère de cave.
         # Utilisé pour matérialiser chaque exemplaire dans la table bouteille_cave.
-        cur = self.conn.cursor()
-        cur.execute("INSERT INTO bouteille_cave (id_bouteille, id_etagere, date_mise_en_cave) VALUES (%s, %s, %s)", (self.id_bouteille, self.etagere_id, self.date_mise_en_cave))
+        registre.executer(self.conn, "bouteille_cave.inserer", (self.id_bouteille, self.etagere_id, self.date_mise_en_cave))
 
     def obtenir_groupes_par_cave_par_etagere(self, cave_id: int):
         # Regroupe par caractéristiques et par étagère, inclut la photo éventuelle.
         # Utilisé par la page détail de cave pour afficher des "lots" avec une quantité (COUNT). 
-        cur = self.conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT 
-              b.domaine_viticole,
-              b.nom,
-              b.type,
-              b.annee,
-              b.region,
-              MIN(b.photo_etiquette) AS photo_etiquette,
-              e.nom AS etagere_nom,
-              COUNT(*) AS quantite
-            FROM bouteille_cave bc
-            JOIN bouteille b ON b.id = bc.id_bouteille
-            JOIN etagere e ON e.id = bc.id_etagere
-            WHERE e.id_cave=%s
-            GROUP BY b.domaine_viticole, b.nom, b.type, b.annee, b.region, e.nom
-            ORDER BY b.nom, b.annee, e.nom
-            """,
-            (cave_id,),
-        )
-        return cur.fetchall()
+        return registre.lignes(self.conn, "bouteille_cave.groupes_par_cave", (cave_id,))
 
     @staticmethod
     def selectionner_pour_archivage(conn, cave_id: int, domaine: str, nom: str, type_vin: str, annee: int, region: str, quantite: int):
         # Sélectionne des bouteilles à archiver par leurs caractéristiques.
         # Utilisé par /bouteilles/archiver pour récupérer N exemplaires à sortir de la cave et à archiver.
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT b.*, bc.id AS bc_id
-            FROM bouteille_cave bc
-            JOIN bouteille b ON b.id = bc.id_bouteille
-            JOIN etagere e ON e.id = bc.id_etagere
-            WHERE e.id_cave=%s AND b.domaine_viticole=%s AND b.nom=%s AND b.type=%s AND b.annee=%s AND (b.region=%s OR (b.region IS NULL AND %s IS NULL))
-            LIMIT %s
-            """,
-            (cave_id, domaine, nom, type_vin, annee, region, region, quantite),
-        )
-        return cur.fetchall()
+        return registre.lignes(conn, "bouteille_cave.pour_archivage", (cave_id, domaine, nom, type_vin, annee, region, region, quantite))
 
     @staticmethod
     def selectionner_pour_suppression(conn, cave_id: int, domaine: str, nom: str, type_vin: str, annee: int, region: str, quantite: int):
         # Sélectionne des bouteilles à supprimer par leurs caractéristiques.
         # Utilisé par /bouteilles/supprimer pour retirer N exemplaires sans archivage.
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT bc.id AS bc_id
-            FROM bouteille_cave bc
-            JOIN bouteille b ON b.id = bc.id_bouteille
-            JOIN etagere e ON e.id = bc.id_etagere
-            WHERE e.id_cave=%s AND b.domaine_viticole=%s AND b.nom=%s AND b.type=%s AND b.annee=%s AND (b.region=%s OR (b.region IS NULL AND %s IS NULL))
-            LIMIT %s
-            """,
-            (cave_id, domaine, nom, type_vin, annee, region, region, quantite),
-        )
-        return cur.fetchall()
+        return registre.lignes(conn, "bouteille_cave.pour_suppression", (cave_id, domaine, nom, type_vin, annee, region, region, quantite))
+
+    @staticmethod
+    def selectionner_pour_deplacement(conn, cave_id: int, domaine: str, nom: str, type_vin: str, annee: int, region: str, etagere_id: int, quantite: int):
+        # Sélectionne des bouteilles à déplacer parmi celles qui ne sont pas déjà sur l'étagère cible.
+        # Utilisé par l'opération "deplacer" de l'API JSON (api.py).
+        return registre.lignes(conn, "bouteille_cave.pour_deplacement", (cave_id, domaine, nom, type_vin, annee, region, region, etagere_id, quantite))
 
     @staticmethod
     def supprimer_bouteille_cave(conn, bc_id: int):
         # Supprime une entrée bouteille_cave par son identifiant (ligne précise).
         # Utilisé après sélection pour décrémenter la quantité effective en cave.
-        cur = conn.cursor()
-        cur.execute("DELETE FROM bouteille_cave WHERE id=%s", (bc_id,))
+        registre.executer(conn, "bouteille_cave.supprimer", (bc_id,))
+
+    @staticmethod
+    def archiver_exemplaires(conn, rows, utilisateur_id: int, note: float = None, commentaire: str = None):
+        # Archive les exemplaires sélectionnés (note/commentaire) puis les retire de la cave.
+        # Utilisé par /bouteilles/archiver et par le worker de tâches de fond (worker.py).
+        for row in rows:
+            b = Bouteille(row["domaine_viticole"], row["nom"], row["type"], row["annee"], row["region"], row.get("photo_etiquette"), float(row["prix"]) if row.get("prix") is not None else None, row["id"], conn)
+            ba = BouteilleArchivee(b.domaine_viticole, b.nom, b.type, b.annee, b.region, date.today(),
+                                   note=note, commentaire=commentaire,
+                                   utilisateur_id=utilisateur_id, prix=b.prix, id_archive=None, conn=conn)
+            ba.sauvegarder(b.id_bouteille)
+            BouteilleCave.supprimer_bouteille_cave(conn, row["bc_id"])
+        return len(rows)
+
+    @staticmethod
+    def deplacer_exemplaires(conn, rows, etagere_id: int):
+        # Change d'étagère les exemplaires sélectionnés.
+        # Utilisé par l'opération "deplacer" de l'API JSON (api.py).
+        for row in rows:
+            registre.executer(conn, "bouteille_cave.deplacer", (etagere_id, row["bc_id"]))
+        return len(rows)
+
+    @staticmethod
+    def supprimer_exemplaires(conn, rows):
+        # Retire de la cave les exemplaires sélectionnés, sans archivage.
+        # Utilisé par /bouteilles/supprimer et par le worker de tâches de fond (worker.py).
+        for row in rows:
+            BouteilleCave.supprimer_bouteille_cave(conn, row["bc_id"])
+        return len(rows)
 
 
 class BouteilleArchivee(Bouteille):
@@ -263,9 +273,8 @@ class BouteilleArchivee(Bouteille):
     def sauvegarder(self, id_bouteille: int):
         # Insère une ligne d'archive liée à une bouteille existante.
         # Utilisé pendant l'archivage pour conserver note/commentaire et la date de sortie.
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO bouteille_archivee (id_bouteille, id_utilisateur, date_archivage, note, commentaire) VALUES (%s, %s, %s, %s, %s)",
+        registre.executer(
+            self.conn, "bouteille_archivee.inserer",
             (id_bouteille, self.utilisateur_id, self.date_archivage, self.note, self.commentaire),
         )
 
@@ -273,48 +282,122 @@ class BouteilleArchivee(Bouteille):
     def obtenir_resume_avis(conn, domaine: str, nom: str, type_vin: str, annee: int, region: str):
         # Retourne la moyenne des notes et le nombre d'avis pour un vin donné.
         # Utilisé par /avis/details pour afficher le résumé (moyenne et nb d'avis).
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT AVG(ba.note) AS moyenne, COUNT(*) AS nb_avis
-            FROM bouteille_archivee ba
-            JOIN bouteille b ON b.id = ba.id_bouteille
-            WHERE b.domaine_viticole=%s AND b.nom=%s AND b.type=%s AND b.annee=%s AND (b.region=%s OR (b.region IS NULL AND %s IS NULL))
-            """,
-            (domaine, nom, type_vin, annee, region, region),
-        )
-        return cur.fetchone()
+        return registre.ligne(conn, "bouteille_archivee.resume_avis", (domaine, nom, type_vin, annee, region, region))
 
     @staticmethod
     def obtenir_avis_detail(conn, domaine: str, nom: str, type_vin: str, annee: int, region: str):
         # Retourne tous les avis (notes et commentaires) pour un vin donné, triés par date décroissante.
         # Utilisé par /avis/details pour lister les commentaires individuels.
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT ba.note, ba.commentaire
-            FROM bouteille_archivee ba
-            JOIN bouteille b ON b.id = ba.id_bouteille
-            WHERE b.domaine_viticole=%s AND b.nom=%s AND b.type=%s AND b.annee=%s AND (b.region=%s OR (b.region IS NULL AND %s IS NULL))
-            ORDER BY ba.date_archivage DESC
-            """,
-            (domaine, nom, type_vin, annee, region, region),
-        )
-        return cur.fetchall()
+        return registre.lignes(conn, "bouteille_archivee.avis_detail", (domaine, nom, type_vin, annee, region, region))
 
     @staticmethod
     def obtenir_groupes_avis_avec_photos(conn):
         # Agrège les archives: moyenne/nb avis par vin + photo d'étiquette quand dispo.
         # Utilisé par /avis pour afficher la liste des vins notés avec leur visuel.
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT b.domaine_viticole, b.nom, b.type, b.annee, b.region, MIN(b.photo_etiquette) AS photo_etiquette,
-                   AVG(ba.note) AS moyenne, COUNT(*) AS nb_avis
-            FROM bouteille_archivee ba
-            JOIN bouteille b ON b.id = ba.id_bouteille
-            GROUP BY b.domaine_viticole, b.nom, b.type, b.annee, b.region
-            ORDER BY b.nom, b.annee
-            """
+        return registre.lignes(conn, "bouteille_archivee.groupes_avis")
+
+
+class Tache:
+    # Tâche de fond (archivage/suppression en masse, ...) stockée dans la table tache et exécutée par worker.py.
+    # Clé d'idempotence: une même soumission reçue deux fois (double clic, renvoi du formulaire) retrouve
+    # la tâche déjà créée, même terminée, au lieu d'en créer une autre. Elle inclut le jeton de soumission
+    # du formulaire: une nouvelle demande identique crée bien une nouvelle tâche.
+    STATUTS = ("en_attente", "en_cours", "terminee", "echouee")
+
+    def __init__(self, type: str, parametres: dict, utilisateur_id: int, total: int = 0, statut: str = "en_attente", progression: int = 0, tentatives: int = 0, erreur: str = None, id_tache: Optional[int] = None, jeton: str = None, conn=None):
+        self.id_tache = id_tache
+        self.type = type
+        self.parametres = parametres
+        self.utilisateur_id = utilisateur_id
+        self.total = total
+        self.statut = statut
+        self.progression = progression
+        self.tentatives = tentatives
+        self.erreur = erreur
+        self.jeton = jeton
+        self.conn = conn
+
+    def cle_idempotence(self) -> str:
+        # Empreinte de la soumission (utilisateur, type, paramètres et jeton de soumission).
+        # Sans jeton, un jeton unique est tiré: la tâche n'est alors jamais fusionnée avec une autre.
+        if not self.jeton:
+            self.jeton = uuid.uuid4().hex
+        contenu = json.dumps([self.utilisateur_id, self.type, self.parametres, self.jeton], sort_keys=True, default=str)
+        return hashlib.sha256(contenu.encode("utf-8")).hexdigest()
+
+    def sauvegarder(self) -> int:
+        # Met la tâche en file (sauf si la même soumission existe déjà) et renvoie son identifiant.
+        # Utilisé par les routes /bouteilles/* au-delà du seuil de traitement en arrière-plan.
+        # La clé est conservée après la fin de la tâche: la relecture par clé trouve toujours la tâche.
+        cle = self.cle_idempotence()
+        maintenant = datetime.now()
+        registre.executer(
+            self.conn, "tache.inserer",
+            (self.type, json.dumps(self.parametres, default=str), cle, self.utilisateur_id, self.total, maintenant, maintenant),
         )
-        return cur.fetchall()
+        self.id_tache = int(registre.ligne(self.conn, "tache.par_cle", (cle,))["id"])
+        return self.id_tache
+
+    def en_dict(self) -> dict:
+        # Représentation JSON de l'avancement.
+        # Utilisé par /taches/<id> pour le suivi de progression.
+        return {
+            "id": self.id_tache,
+            "type": self.type,
+            "statut": self.statut,
+            "progression": self.progression,
+            "total": self.total,
+            "tentatives": self.tentatives,
+            "erreur": self.erreur,
+        }
+
+    @staticmethod
+    def _depuis_row(conn, row) -> "Tache":
+        return Tache(row["type"], json.loads(row["parametres"]), row["id_utilisateur"], row["total"], row["statut"], row["progression"], row["tentatives"], row["erreur"], row["id"], conn=conn)
+
+    @staticmethod
+    def trouver_par_id(conn, tache_id: int) -> Optional["Tache"]:
+        # Récupère une tâche par son identifiant.
+        # Utilisé par /taches/<id> et par le worker.
+        row = registre.ligne(conn, "tache.par_id", (tache_id,))
+        return Tache._depuis_row(conn, row) if row else None
+
+    @staticmethod
+    def reserver_suivante(conn, id_worker: str) -> Optional["Tache"]:
+        # Réserve la plus ancienne tâche en attente pour ce worker.
+        # L'UPDATE conditionnel sur le statut garantit qu'un seul worker obtient la tâche.
+        maintenant = datetime.now()
+        row = registre.ligne(conn, "tache.prochaine", (maintenant,))
+        if not row:
+            return None
+        cur = registre.executer(conn, "tache.reserver", (id_worker, maintenant, row["id"]))
+        if cur.rowcount != 1:
+            return None
+        return Tache.trouver_par_id(conn, row["id"])
+
+    @staticmethod
+    def enregistrer_progression(conn, tache_id: int, progression: int):
+        # Met à jour l'avancement (sert aussi de signe de vie pour reprendre_bloquees).
+        registre.executer(conn, "tache.progression", (progression, datetime.now(), tache_id))
+
+    @staticmethod
+    def terminer(conn, tache_id: int):
+        # Marque la tâche comme terminée.
+        registre.executer(conn, "tache.terminer", (datetime.now(), tache_id))
+
+    @staticmethod
+    def echouer(conn, tache: "Tache", erreur: str, max_tentatives: int, delai_s: int):
+        # Remet la tâche en file après un délai croissant, ou l'abandonne après max_tentatives essais.
+        maintenant = datetime.now()
+        if tache.tentatives < max_tentatives:
+            registre.executer(conn, "tache.reessayer", (erreur, maintenant + timedelta(seconds=delai_s * tache.tentatives), maintenant, tache.id_tache))
+        else:
+            registre.executer(conn, "tache.abandonner", (erreur, maintenant, tache.id_tache))
+
+    @staticmethod
+    def reprendre_bloquees(conn, delai_s: int) -> int:
+        # Remet en file les tâches "en_cours" sans signe de vie depuis delai_s secondes (worker arrêté brutalement).
+        # Utilisé au démarrage de worker.py.
+        maintenant = datetime.now()
+        cur = registre.executer(conn, "tache.reprendre_bloquees", (maintenant, maintenant - timedelta(seconds=delai_s)))
+        return cur.rowcount
@@ -0,0 +1,265 @@
+import math
+from flask import Blueprint, current_app, jsonify, request, session
+from werkzeug.exceptions import HTTPException
+from db import connexion_requete, stockage
+from GestionCave import ALLOWED_TYPES, Utilisateur, Cave, Etagere, Bouteille, BouteilleCave
+from requetes import registre
+
+# API JSON versionnée (/api/v1) au-dessus des mêmes opérations que les formulaires de app.py.
+# Destinée aux clients "scanner": pas de rendu de template, réponses compactes,
+# et un point d'entrée par lots exécutant de nombreuses opérations en une seule transaction.
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+MAX_OPERATIONS_LOT = 500  # Nombre maximal d'opérations par requête /operations
+PRIX_MAX = 10000          # Colonne bouteille.prix decimal(6,2): au plus 9999.99
+NOTE_MAX = 20
+
+
+class OperationInvalide(ValueError):
+    # Erreur de validation d'une opération du lot (renvoyée dans le résultat de l'opération).
+    pass
+
+
+def _conn():
+    # Connexion du pool réservée à la requête en cours (voir db.py)
+    return connexion_requete()
+
+
+def _erreur(message, statut):
+    return jsonify({"ok": False, "erreur": message}), statut
+
+
+def _corps_json():
+    # Corps JSON de la requête s'il s'agit d'un objet, sinon None
+    donnees = request.get_json(silent=True)
+    return donnees if isinstance(donnees, dict) else None
+
+
+def _cave_du_proprietaire(conn, cave_id):
+    # Renvoie la cave si elle appartient à l'utilisateur connecté, sinon None
+    cave = Cave("", 0, conn=conn).trouver_par_id(cave_id)
+    if not cave or cave.utilisateur_id != session.get("user_id"):
+        return None
+    return cave
+
+
+def _champ(op, nom, conversion=str, obligatoire=True):
+    # Lit et convertit un champ d'opération (valeur simple: chaîne ou nombre, jamais un booléen)
+    valeur = op.get(nom)
+    if isinstance(valeur, bool) or (valeur is not None and not isinstance(valeur, (str, int, float))):
+        raise OperationInvalide(f"Champ invalide: {nom}")
+    if valeur is None or valeur == "":
+        if obligatoire:
+            raise OperationInvalide(f"Champ manquant: {nom}")
+        return None
+    try:
+        return conversion(valeur)
+    except (TypeError, ValueError):
+        raise OperationInvalide(f"Champ invalide: {nom}")
+
+
+def _entier(valeur):
+    # Nombre entier (2020 ou "2020"); 2020.7 est refusé au lieu d'être tronqué
+    if isinstance(valeur, float) and not valeur.is_integer():
+        raise ValueError(valeur)
+    entier = int(valeur)
+    if not -2**31 <= entier < 2**31:  # colonnes int
+        raise ValueError(valeur)
+    return entier
+
+
+def _reel_borne(maximum, inclus=False):
+    # Conversion en nombre fini compris entre 0 et maximum (inf et nan refusés)
+    def conversion(valeur):
+        reel = float(valeur)
+        if not math.isfinite(reel) or reel < 0 or reel > maximum or (reel == maximum and not inclus):
+            raise ValueError(valeur)
+        return reel
+    return conversion
+
+
+def _texte(op, nom):
+    # Champ texte facultatif repris tel quel (chaîne vide comprise)
+    valeur = op.get(nom)
+    if valeur is not None and not isinstance(valeur, str):
+        raise OperationInvalide(f"Champ invalide: {nom}")
+    return valeur
+
+
+def _caracteristiques(op):
+    # Caractéristiques identifiant un lot de bouteilles (comme les champs cachés des formulaires)
+    type_vin = _champ(op, "type")
+    if type_vin not in ALLOWED_TYPES:
+        raise OperationInvalide("Type de vin invalide")
+    # La région est reprise telle quelle (chaîne vide comprise), comme dans les formulaires qui créent les lots
+    return (_champ(op, "domaine_viticole"), _champ(op, "nom"), type_vin, _champ(op, "annee", _entier), _texte(op, "region"))
+
+
+def _quantite(op):
+    # 1 exemplaire si le champ est absent; une quantité fournie doit être au moins 1
+    if op.get("quantite") is None:
+        return 1
+    quantite = _champ(op, "quantite", _entier)
+    if quantite < 1:
+        raise OperationInvalide("Quantité invalide")
+    return quantite
+
+
+def _etagere_avec_place(conn, cave_id, op, quantite):
+    # Valide l'étagère cible (appartenance à la cave et capacité restante)
+    etagere_id = _champ(op, "etagere_id", _entier)
+    if not Etagere.verifier_existe_dans_cave(conn, etagere_id, cave_id):
+        raise OperationInvalide("Étagère inexistante ou n'appartenant pas à cette cave")
+    capacite = Etagere.obtenir_capacite(conn, etagere_id)
+    if capacite and Etagere.compter_bouteilles_par_etagere(conn, etagere_id) + quantite > capacite:
+        raise OperationInvalide("Capacité maximale atteinte pour cette étagère")
+    return etagere_id
+
+
+def _selection_complete(rows, quantite):
+    # Refuse une opération portant sur plus d'exemplaires que la cave n'en contient
+    if len(rows) < quantite:
+        raise OperationInvalide(f"Seulement {len(rows)} exemplaire(s) disponible(s)")
+    return rows
+
+
+def op_ajouter(conn, cave_id, op):
+    domaine, nom, type_vin, annee, region = _caracteristiques(op)
+    quantite = _quantite(op)
+    etagere_id = _etagere_avec_place(conn, cave_id, op, quantite)
+    prix = _champ(op, "prix", _reel_borne(PRIX_MAX), obligatoire=False)
+    bid = Bouteille(domaine, nom, type_vin, annee, region, prix=prix, conn=conn).sauvegarder()
+    for _ in range(quantite):
+        BouteilleCave(domaine, nom, type_vin, annee, region, etagere_id, prix=prix, id_bouteille=bid, conn=conn).sauvegarder()
+    return quantite
+
+
+def op_archiver(conn, cave_id, op):
+    caracteristiques = _caracteristiques(op)
+    quantite = _quantite(op)
+    note = _champ(op, "note", _reel_borne(NOTE_MAX, inclus=True), obligatoire=False)
+    rows = _selection_complete(BouteilleCave.selectionner_pour_archivage(conn, cave_id, *caracteristiques, quantite), quantite)
+    return BouteilleCave.archiver_exemplaires(conn, rows, session["user_id"], note, _texte(op, "commentaire"))
+
+
+def op_supprimer(conn, cave_id, op):
+    caracteristiques = _caracteristiques(op)
+    quantite = _quantite(op)
+    rows = _selection_complete(BouteilleCave.selectionner_pour_suppression(conn, cave_id, *caracteristiques, quantite), quantite)
+    return BouteilleCave.supprimer_exemplaires(conn, rows)
+
+
+def op_deplacer(conn, cave_id, op):
+    caracteristiques = _caracteristiques(op)
+    quantite = _quantite(op)
+    etagere_id = _etagere_avec_place(conn, cave_id, op, quantite)
+    # Seuls les exemplaires situés sur une autre étagère sont déplacés (et comptés dans la capacité de la cible)
+    rows = _selection_complete(BouteilleCave.selectionner_pour_deplacement(conn, cave_id, *caracteristiques, etagere_id, quantite), quantite)
+    return BouteilleCave.deplacer_exemplaires(conn, rows, etagere_id)
+
+
+OPERATIONS = {
+    "ajouter": op_ajouter,
+    "archiver": op_archiver,
+    "supprimer": op_supprimer,
+    "deplacer": op_deplacer,
+}
+
+
+@api.errorhandler(Exception)
+def erreur_api(e):
+    # Toute erreur d'une route de l'API est renvoyée au format JSON (et non en page HTML)
+    if isinstance(e, HTTPException):
+        return _erreur(e.description, e.code)
+    current_app.logger.exception("Erreur de l'API")
+    return _erreur("Erreur interne", 500)
+
+
+@api.route("/session", methods=["POST"])
+def connexion():
+    # Authentification JSON (même session que les pages HTML)
+    donnees = _corps_json()
+    if donnees is None:
+        return _erreur("Objet JSON attendu", 400)
+    u = Utilisateur(donnees.get("nom"), donnees.get("prenom"), donnees.get("mot_de_passe"), conn=_conn()).trouver_par_identifiants()
+    if not u:
+        return _erreur("Identifiants invalides", 401)
+    session["user_id"] = u.id_utilisateur
+    session["user_nom"] = u.nom
+    session["user_prenom"] = u.prenom
+    return jsonify({"ok": True, "id": u.id_utilisateur})
+
+
+@api.route("/caves")
+def mes_caves():
+    # Caves de l'utilisateur connecté avec leurs indicateurs (une seule requête, quel que soit leur nombre)
+    if "user_id" not in session:
+        return _erreur("Authentification requise", 401)
+    caves = Cave("", 0, conn=_conn()).obtenir_apercu_par_utilisateur(session["user_id"])
+    return jsonify([c.en_dict() for c in caves])
+
+
+@api.route("/caves/<int:cave_id>")
+def detail_cave(cave_id: int):
+    # Contenu d'une cave: étagères et lots groupés (équivalent JSON de /caves/<id>)
+    conn = _conn()
+    cave = Cave("", 0, conn=conn).trouver_par_id(cave_id)
+    if not cave:
+        return _erreur("Cave inconnue", 404)
+    etageres = Etagere("", 0, cave_id, conn=conn).obtenir_par_cave(cave_id)
+    lots = BouteilleCave("", "", "", 0, "", 0, conn=conn).obtenir_groupes_par_cave_par_etagere(cave_id)
+    return jsonify({
+        "id": cave.id_cave,
+        "nom": cave.nom,
+        "utilisateur_id": cave.utilisateur_id,
+        "etageres": [{"id": e.id_etagere, "nom": e.nom, "capacite": e.capacite} for e in etageres],
+        "lots": lots,
+    })
+
+
+@api.route("/stats/requetes")
+def stats_requetes():
+    # Exécutions et durées par requête préparée (processus courant), pour le suivi de performance
+    if "user_id" not in session:
+        return _erreur("Authentification requise", 401)
+    return jsonify(registre.statistiques())
+
+
+@api.route("/caves/<int:cave_id>/operations", methods=["POST"])
+def operations(cave_id: int):
+    # Exécute un lot d'opérations {"operations": [{"op": "ajouter"|"archiver"|"supprimer"|"deplacer", ...}]}
+    # dans une seule transaction: à la première opération invalide, tout le lot est annulé.
+    # La réponse détaille le résultat de chaque opération exécutée (nombre d'exemplaires ou erreur).
+    if "user_id" not in session:
+        return _erreur("Authentification requise", 401)
+    conn = _conn()
+    if not _cave_du_proprietaire(conn, cave_id):
+        return _erreur("Action non autorisée", 403)
+    donnees = _corps_json()
+    if donnees is None:
+        return _erreur("Objet JSON attendu", 400)
+    ops = donnees.get("operations")
+    if not isinstance(ops, list) or not ops:
+        return _erreur("Liste 'operations' attendue", 400)
+    if len(ops) > MAX_OPERATIONS_LOT:
+        return _erreur(f"Au plus {MAX_OPERATIONS_LOT} opérations par lot", 413)
+
+    resultats = []
+    stockage.debut_transaction(conn)
+    try:
+        for i, op in enumerate(ops):
+            executer = OPERATIONS.get(op.get("op")) if isinstance(op, dict) and isinstance(op.get("op"), str) else None
+            try:
+                if executer is None:
+                    raise OperationInvalide("Opération inconnue")
+                resultats.append({"i": i, "ok": True, "n": executer(conn, cave_id, op)})
+            except OperationInvalide as e:
+                resultats.append({"i": i, "ok": False, "erreur": str(e)})
+                stockage.annuler(conn)
+                return jsonify({"ok": False, "resultats": resultats}), 422
+        stockage.valider(conn)
+    except Exception:
+        stockage.annuler(conn)
+        raise
+    return jsonify({"ok": True, "resultats": resultats})
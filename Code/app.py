@@ -1,39 +1,67 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from datetime import date
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, session, flash, jsonify, abort
 import os
+import stat
+import threading
+import time
 import uuid
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.local import LocalProxy
 from werkzeug.utils import secure_filename
-from db import DB
-from GestionCave import Utilisateur, Cave, Etagere, Bouteille, BouteilleCave, BouteilleArchivee
+from db import connexion_requete, liberer_connexion_requete, stockage
+from api import api
+from cache_fragments import CacheFragments
+from requetes import registre
+from GestionCave import ALLOWED_TYPES, Utilisateur, Cave, Etagere, Bouteille, BouteilleCave, BouteilleArchivee, Tache
 
-app = Flask(__name__)
-db = DB()
-conn = db.conn  # Connexion MySQL partagée
-
-app.secret_key = "dev-secret"  # Clé de session (à sécuriser en production)
+# Routes des pages HTML; l'application est assemblée par create_app() en bas de fichier.
+web = Blueprint("web", __name__)
+conn = LocalProxy(connexion_requete)  # Connexion du pool, empruntée à la première utilisation dans la requête
 
 # Configuration pour l'upload d'images
 UPLOAD_FOLDER = 'static/images'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 
-ALLOWED_TYPES = ["Rouge", "Blanc", "Rosé", "Champagne"]  # Types de vins acceptés
+# Templates compilés partagés entre les processus de la machine (évite de recompiler à chaque démarrage).
+# Par défaut: dossier privé de l'utilisateur choisi par Jinja (<tmp>/_jinja2-cache-<uid>, mode 0700, propriétaire vérifié)
+DOSSIER_CACHE_JINJA = os.environ.get("GESTIONCAVE_CACHE_JINJA")
+
+# Au-delà de ce nombre d'exemplaires, archivage/suppression sont confiés au worker (worker.py)
+SEUIL_TACHE_ARRIERE_PLAN = 50
+
+def dossier_cache_prive(chemin):
+    # Crée si besoin le dossier du cache de templates et vérifie qu'il n'est modifiable que par l'utilisateur courant:
+    # les fichiers .cache sont chargés et exécutés tels quels, un dossier partagé permettrait d'y injecter du code.
+    os.makedirs(chemin, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid"):
+        infos = os.lstat(chemin)
+        if not stat.S_ISDIR(infos.st_mode) or infos.st_uid != os.getuid() or infos.st_mode & 0o077:
+            raise RuntimeError(f"Dossier de cache des templates non sûr (propriétaire ou droits): {chemin}")
+    return chemin
+
 
 def allowed_file(filename):
     # Vérifie l'extension autorisée pour l'upload d'image
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-@app.route("/")
+def mettre_en_file(type_tache, parametres, quantite):
+    # Confie une opération lourde au worker et prévient l'utilisateur (réponse immédiate).
+    # Le jeton de soumission du formulaire évite de créer deux tâches pour un double envoi.
+    tache = Tache(type_tache, parametres, session["user_id"], total=quantite, jeton=request.form.get("jeton"), conn=conn)
+    tache_id = tache.sauvegarder()
+    flash(f"Opération sur {quantite} bouteilles lancée en arrière-plan (tâche n°{tache_id})")
+    return tache_id
+
+
+@web.route("/")
 def index():
     # Page d'accueil: redirige vers login si non connecté
     if not session.get("user_id"):
-        return redirect(url_for("login"))
+        return redirect(url_for("web.login"))
     return render_template("index.html")
 
 
-@app.route("/login", methods=["GET", "POST"])
+@web.route("/login", methods=["GET", "POST"])
 def login():
     # Authentification par nom/prénom/mdp
     if request.method == "POST":
@@ -46,12 +74,12 @@ def login():
             session["user_id"] = u.id_utilisateur
             session["user_nom"] = u.nom
             session["user_prenom"] = u.prenom
-            return redirect(url_for("index"))
+            return redirect(url_for("web.index"))
         flash("Identifiants invalides")
     return render_template("login.html")
 
 
-@app.route("/register", methods=["GET", "POST"])
+@web.route("/register", methods=["GET", "POST"])
 def register():
     # Création d'un compte utilisateur
     if request.method == "POST":
@@ -61,49 +89,49 @@ def register():
         user = Utilisateur(nom, prenom, mot_de_passe, conn=conn)
         user.sauvegarder()
         flash("Compte créé. Vous pouvez vous connecter.")
-        return redirect(url_for("login"))
+        return redirect(url_for("web.login"))
     return render_template("register.html")
 
 
-@app.route("/logout")
+@web.route("/logout")
 def logout():
     # Déconnexion: nettoyage de la session
     session.clear()
-    return redirect(url_for("index"))
+    return redirect(url_for("web.index"))
 
 
-@app.route("/caves/creer", methods=["GET", "POST"])
+@web.route("/caves/creer", methods=["GET", "POST"])
 def creer_cave():
     # Création d'une nouvelle cave (réservé aux utilisateurs connectés)
     if request.method == "POST":
         if "user_id" not in session:
-            return redirect(url_for("login"))
+            return redirect(url_for("web.login"))
         nom = request.form.get("nom")
         cave = Cave(nom, session["user_id"], conn=conn)
         cave.sauvegarder()
-        return redirect(url_for("mes_caves"))
+        return redirect(url_for("web.mes_caves"))
     return render_template("creer_cave.html")
 
 
-@app.route("/caves/mes")
+@web.route("/caves/mes")
 def mes_caves():
     # Liste des caves de l'utilisateur connecté
     if "user_id" not in session:
-        return redirect(url_for("login"))
+        return redirect(url_for("web.login"))
     c = Cave("", 0, conn=conn)
-    caves = c.obtenir_par_utilisateur(session["user_id"])
+    caves = c.obtenir_apercu_par_utilisateur(session["user_id"])
     return render_template("mes_caves.html", caves=caves)
 
 
-@app.route("/caves/explorer")
+@web.route("/caves/explorer")
 def explorer_caves():
     # Exploration de toutes les caves (vue publique)
     c = Cave("", 0, conn=conn)
-    caves = c.obtenir_toutes()
+    caves = c.obtenir_apercu_toutes()
     return render_template("explorer_caves.html", caves=caves, user_id=session.get("user_id"))
 
 
-@app.route("/caves/<int:cave_id>")
+@web.route("/caves/<int:cave_id>")
 def detail_cave(cave_id: int):
     # Détail d'une cave: listing des bouteilles groupées et actions
     c = Cave("", 0, conn=conn) 
@@ -121,61 +149,63 @@ def detail_cave(cave_id: int):
     if ordre == "desc":
         groupes = list(reversed(groupes))
     est_proprietaire = session.get("user_id") == cave.utilisateur_id if cave else False
-    return render_template("detail_cave.html", cave=cave, etageres=etageres, groupes=groupes, est_proprietaire=est_proprietaire, tri=tri, ordre=ordre, allowed_types=ALLOWED_TYPES)
+    # Jeton de soumission propre à cet affichage (rendu dans les formulaires d'archivage/suppression)
+    jeton = uuid.uuid4().hex
+    return render_template("detail_cave.html", cave=cave, etageres=etageres, groupes=groupes, est_proprietaire=est_proprietaire, tri=tri, ordre=ordre, allowed_types=ALLOWED_TYPES, jeton=jeton)
 
 
-@app.route("/etagere/creer", methods=["POST"])
+@web.route("/etagere/creer", methods=["POST"])
 def creer_etagere():
     # Ajoute une étagère dans la cave (propriétaire seulement)
     if "user_id" not in session:
-        return redirect(url_for("login"))
+        return redirect(url_for("web.login"))
     cave_id = int(request.form.get("cave_id"))
     c = Cave("", 0, conn=conn)
     cave = c.trouver_par_id(cave_id)
     if not cave or cave.utilisateur_id != session["user_id"]:
         flash("Action non autorisée")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
     nom = request.form.get("nom")
     capacite = int(request.form.get("capacite"))
     Etagere(nom, capacite, cave_id, conn=conn).sauvegarder()
-    return redirect(url_for("detail_cave", cave_id=cave_id))
+    return redirect(url_for("web.detail_cave", cave_id=cave_id))
 
 
-@app.route("/etagere/supprimer", methods=["POST"])
+@web.route("/etagere/supprimer", methods=["POST"])
 def supprimer_etagere():
     # Supprime une étagère vide (propriétaire seulement)
     if "user_id" not in session:
-        return redirect(url_for("login"))
+        return redirect(url_for("web.login"))
     cave_id = int(request.form.get("cave_id"))
     id_etagere = int(request.form.get("id_etagere"))
     c = Cave("", 0, conn=conn)
     cave = c.trouver_par_id(cave_id)
     if not cave or cave.utilisateur_id != session["user_id"]:
         flash("Action non autorisée")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
     e = Etagere("", 0, cave_id, id_etagere=id_etagere, conn=conn)
     if not e.supprimer_si_vide():
         flash("Impossible de supprimer : l'étagère contient des bouteilles")
-    return redirect(url_for("detail_cave", cave_id=cave_id))
+    return redirect(url_for("web.detail_cave", cave_id=cave_id))
 
 
-@app.route("/bouteilles/ajouter", methods=["POST"])
+@web.route("/bouteilles/ajouter", methods=["POST"])
 def ajouter_bouteille():
     # Ajoute N exemplaires d'une bouteille (avec upload d'image optionnel)
     if "user_id" not in session:
-        return redirect(url_for("login"))
+        return redirect(url_for("web.login"))
     cave_id = int(request.form.get("cave_id"))
     c = Cave("", 0, conn=conn)
     cave = c.trouver_par_id(cave_id)
     if not cave or cave.utilisateur_id != session["user_id"]:
         flash("Action non autorisée")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
     domaine = request.form.get("domaine_viticole")
     nom = request.form.get("nom")
     type_vin = request.form.get("type")
     if type_vin not in ALLOWED_TYPES:
         flash("Type de vin invalide")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
     annee = int(request.form.get("annee"))
     region = request.form.get("region")
     prix = request.form.get("prix")
@@ -185,18 +215,18 @@ def ajouter_bouteille():
     nb_etageres = Etagere.compter_par_cave(conn, cave_id)
     if nb_etageres == 0:
         flash("Aucune étagère dans cette cave. Créez d'abord une étagère.")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
     if not etagere_id_raw:
         flash("Veuillez sélectionner une étagère valide")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
     try:
         etagere_id = int(etagere_id_raw)
     except ValueError:
         flash("Identifiant d'étagère invalide")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
     if not Etagere.verifier_existe_dans_cave(conn, etagere_id, cave_id):
         flash("Étagère inexistante ou n'appartenant pas à cette cave")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
 
     # Gestion de l'upload d'image
     photo_filename = None
@@ -207,7 +237,7 @@ def ajouter_bouteille():
             filename = secure_filename(file.filename)
             name, ext = os.path.splitext(filename)
             unique_filename = f"{name}_{uuid.uuid4().hex[:8]}{ext}"
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], unique_filename))
+            file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename))
             photo_filename = unique_filename
 
     # Contrôle de capacité d'étagère
@@ -215,21 +245,21 @@ def ajouter_bouteille():
     nb_bouteilles = Etagere.compter_bouteilles_par_etagere(conn, etagere_id)
     if capacite and nb_bouteilles + quantite > capacite:
         flash("Capacité maximale atteinte pour cette étagère")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
 
     b = Bouteille(domaine, nom, type_vin, annee, region, photo_etiquette=photo_filename, prix=prix, conn=conn)
     bid = b.sauvegarder()
     for _ in range(quantite):
         bc = BouteilleCave(domaine, nom, type_vin, annee, region, etagere_id, photo_etiquette=photo_filename, prix=prix, id_bouteille=bid, conn=conn)
         bc.sauvegarder()
-    return redirect(url_for("detail_cave", cave_id=cave_id))
+    return redirect(url_for("web.detail_cave", cave_id=cave_id))
 
 
-@app.route("/bouteilles/archiver", methods=["POST"])
+@web.route("/bouteilles/archiver", methods=["POST"])
 def archiver_bouteille():
     # Archive des exemplaires (avec note/commentaire) et les retire de la cave
     if "user_id" not in session:
-        return redirect(url_for("login"))
+        return redirect(url_for("web.login"))
     id_bouteille = request.form.get("id_bouteille")
     note = request.form.get("note")
     commentaire = request.form.get("commentaire")
@@ -239,7 +269,7 @@ def archiver_bouteille():
     type_vin = request.form.get("type")
     if type_vin and type_vin not in ALLOWED_TYPES:
         flash("Type de vin invalide")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
     annee = int(request.form.get("annee"))
     region = request.form.get("region")
     quantite = int(request.form.get("quantite", 1))
@@ -248,32 +278,30 @@ def archiver_bouteille():
     cave = c.trouver_par_id(cave_id)
     if not cave or cave.utilisateur_id != session["user_id"]:
         flash("Action non autorisée")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
 
-    rows = BouteilleCave.selectionner_pour_archivage(conn, cave_id, domaine, nom, type_vin, annee, region, quantite)
+    note = float(note) if note else None
+    if quantite > SEUIL_TACHE_ARRIERE_PLAN:
+        mettre_en_file("archiver", {"cave_id": cave_id, "domaine": domaine, "nom": nom, "type": type_vin, "annee": annee, "region": region, "note": note, "commentaire": commentaire}, quantite)
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
 
-    for row in rows:
-        b = Bouteille(row["domaine_viticole"], row["nom"], row["type"], row["annee"], row["region"], row.get("photo_etiquette"), float(row["prix"]) if row.get("prix") is not None else None, row["id"], conn)
-        ba = BouteilleArchivee(b.domaine_viticole, b.nom, b.type, b.annee, b.region, date.today(),
-                               note=float(note) if note else None, commentaire=commentaire,
-                               utilisateur_id=session["user_id"], prix=b.prix, id_archive=None, conn=conn)
-        ba.sauvegarder(b.id_bouteille)
-        BouteilleCave.supprimer_bouteille_cave(conn, row["bc_id"])
-    return redirect(url_for("detail_cave", cave_id=cave_id))
+    rows = BouteilleCave.selectionner_pour_archivage(conn, cave_id, domaine, nom, type_vin, annee, region, quantite)
+    BouteilleCave.archiver_exemplaires(conn, rows, session["user_id"], note, commentaire)
+    return redirect(url_for("web.detail_cave", cave_id=cave_id))
 
 
-@app.route("/bouteilles/supprimer", methods=["POST"])
+@web.route("/bouteilles/supprimer", methods=["POST"])
 def supprimer_bouteille():
     # Supprime N exemplaires d'un groupe de bouteilles sans archivage
     if "user_id" not in session:
-        return redirect(url_for("login"))
+        return redirect(url_for("web.login"))
     cave_id = int(request.form.get("cave_id"))
     domaine = request.form.get("domaine_viticole")
     nom = request.form.get("nom")
     type_vin = request.form.get("type")
     if type_vin and type_vin not in ALLOWED_TYPES:
         flash("Type de vin invalide")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
     annee = int(request.form.get("annee"))
     region = request.form.get("region")
     quantite = int(request.form.get("quantite", 1))
@@ -282,23 +310,37 @@ def supprimer_bouteille():
     cave = c.trouver_par_id(cave_id)
     if not cave or cave.utilisateur_id != session["user_id"]:
         flash("Action non autorisée")
-        return redirect(url_for("detail_cave", cave_id=cave_id))
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
+
+    if quantite > SEUIL_TACHE_ARRIERE_PLAN:
+        mettre_en_file("supprimer", {"cave_id": cave_id, "domaine": domaine, "nom": nom, "type": type_vin, "annee": annee, "region": region}, quantite)
+        return redirect(url_for("web.detail_cave", cave_id=cave_id))
 
     # Sélectionne les bouteilles à supprimer par leurs caractéristiques
     rows = BouteilleCave.selectionner_pour_suppression(conn, cave_id, domaine, nom, type_vin, annee, region, quantite)
-    for row in rows:
-        BouteilleCave.supprimer_bouteille_cave(conn, row["bc_id"])
-    return redirect(url_for("detail_cave", cave_id=cave_id))
+    BouteilleCave.supprimer_exemplaires(conn, rows)
+    return redirect(url_for("web.detail_cave", cave_id=cave_id))
+
+
+@web.route("/taches/<int:tache_id>")
+def progression_tache(tache_id: int):
+    # Avancement d'une tâche de fond (JSON), visible uniquement par son auteur
+    if "user_id" not in session:
+        return redirect(url_for("web.login"))
+    tache = Tache.trouver_par_id(conn, tache_id)
+    if not tache or tache.utilisateur_id != session["user_id"]:
+        abort(404)
+    return jsonify(tache.en_dict())
 
 
-@app.route("/avis")
+@web.route("/avis")
 def avis():
     # Page communautaire: vue agrégée des archives
     groupes = BouteilleArchivee.obtenir_groupes_avis_avec_photos(conn)
     return render_template("avis.html", groupes=groupes)
 
 
-@app.route("/avis/details")
+@web.route("/avis/details")
 def avis_details():
     # Détails des avis pour un vin spécifique
     domaine = request.args.get("domaine_viticole")
@@ -312,6 +354,94 @@ def avis_details():
     return render_template("avis_detail.html", domaine=domaine, nom=nom, type=type_vin, annee=annee, region=region, resume=resume, avis=avis)
 
 
+@web.route("/sante/vivant")
+def sante_vivant():
+    # Sonde de vivacité: le processus répond, sans toucher à la base
+    return jsonify({"vivant": True})
+
+
+@web.route("/sante/pret")
+def sante_pret():
+    # Sonde de disponibilité: 503 tant que le préchauffage n'est pas terminé ou que la base est injoignable.
+    # Un worker forké après le préchauffage du parent (gunicorn --preload) hérite de pret=True
+    # mais pas du pool: il relance son propre préchauffage.
+    etat = current_app.extensions["gestioncave"]
+    if not etat["pret"] or etat["pid"] != os.getpid():
+        demarrer_prechauffage(current_app._get_current_object())
+        return jsonify({"pret": False, "erreur": etat["erreur"]}), 503
+    try:
+        stockage.verifier(conn)
+    except Exception as e:
+        return jsonify({"pret": False, "erreur": str(e)}), 503
+    return jsonify({"pret": True, "duree_prechauffage_ms": etat["duree_prechauffage_ms"]})
+
+
+def prechauffer(app):
+    # Ouvre les connexions (pool MySQL), prépare les requêtes de lecture sur chacune et compile tous les templates
+    etat = app.extensions["gestioncave"]
+    debut = time.perf_counter()
+    try:
+        connexions = []
+        try:
+            for _ in range(stockage.taille_pool):
+                connexions.append(stockage.emprunter())
+                registre.preparer(connexions[-1])
+        finally:
+            for c in connexions:
+                stockage.rendre(c)
+        for nom in app.jinja_env.list_templates():
+            app.jinja_env.get_template(nom)
+        etat["duree_prechauffage_ms"] = round((time.perf_counter() - debut) * 1000, 1)
+        etat["erreur"] = None
+        etat["pret"] = True
+    except Exception as e:
+        etat["erreur"] = str(e)
+        app.logger.warning("Échec du préchauffage: %s", e)
+    finally:
+        etat["en_cours"] = False
+
+
+def demarrer_prechauffage(app):
+    # Lance le préchauffage en arrière-plan, une fois par processus (un worker forké relance le sien),
+    # ou à nouveau après un échec (base pas encore démarrée...)
+    etat = app.extensions["gestioncave"]
+    with etat["verrou"]:
+        if etat["pret"] and etat["pid"] == os.getpid():
+            return
+        if etat["en_cours"] and etat["pid"] == os.getpid():
+            return
+        etat.update(pid=os.getpid(), pret=False, en_cours=True)
+    threading.Thread(target=prechauffer, args=(app,), daemon=True).start()
+
+
+def create_app(prechauffage=None):
+    # Fabrique de l'application. Aucune connexion n'est ouverte ici: le pool est créé à la première
+    # requête ou par le préchauffage, ce qui rend l'import et le démarrage d'un worker quasi immédiats.
+    # prechauffage (par défaut: variable GESTIONCAVE_PRECHAUFFAGE, activé) conditionne /sante/pret.
+    app = Flask(__name__)
+    app.secret_key = "dev-secret"  # Clé de session (à sécuriser en production)
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
+    if DOSSIER_CACHE_JINJA:
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(dossier_cache_prive(DOSSIER_CACHE_JINJA))
+    else:
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+    app.jinja_env.add_extension(CacheFragments)
+    app.register_blueprint(web)
+    app.register_blueprint(api)
+    app.teardown_appcontext(liberer_connexion_requete)
+
+    if prechauffage is None:
+        prechauffage = os.environ.get("GESTIONCAVE_PRECHAUFFAGE", "1") == "1"
+    app.extensions["gestioncave"] = {
+        "pret": not prechauffage, "en_cours": False, "pid": os.getpid(),
+        "erreur": None, "duree_prechauffage_ms": None, "verrou": threading.Lock(),
+    }
+    if prechauffage:
+        demarrer_prechauffage(app)
+    return app
+
+
 if __name__ == "__main__":
     # Démarrage du serveur de développement Flask
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,61 @@
+import os
+import threading
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+# Cache de fragments Jinja: {% cache cle %} ... {% endcache %}
+# Le HTML rendu d'un bloc est mémorisé sous sa clé (identité de la ligne + révision des données affichées);
+# une page de milliers de lots ne recalcule que les lignes dont la clé a changé.
+# Le cache est propre à chaque processus (LRU borné par GESTIONCAVE_CACHE_FRAGMENTS entrées).
+
+TAILLE_CACHE_FRAGMENTS = int(os.environ.get("GESTIONCAVE_CACHE_FRAGMENTS", "10000"))
+
+
+class CacheLRU:
+    # Dictionnaire borné: au-delà de taille_max, les entrées les moins récemment lues sont évincées.
+    def __init__(self, taille_max: int):
+        self.taille_max = taille_max
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def lire(self, cle):
+        with self._verrou:
+            valeur = self._entrees.get(cle)
+            if valeur is not None:
+                self._entrees.move_to_end(cle)
+            return valeur
+
+    def ecrire(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = valeur
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+class CacheFragments(Extension):
+    # Extension Jinja ajoutant la balise {% cache cle %}; la clé doit être hachable (tuple de valeurs).
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(cache_fragments=CacheLRU(TAILLE_CACHE_FRAGMENTS))
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        cle = parser.parse_expression()
+        corps = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_rendre", [cle]), [], [], corps).set_lineno(lineno)
+
+    def _rendre(self, cle, caller):
+        cache = self.environment.cache_fragments
+        html = cache.lire(cle)
+        if html is None:
+            html = caller()
+            cache.ecrire(cle, html)
+        return html
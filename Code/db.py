@@ -1,15 +1,37 @@
-import mysql.connector
+import os
+from flask import g
+from stockage import StockageMySQL, StockageSQLite
+
+# Ce module centralise la connexion à la base de données.
+# Adapter les paramètres de PARAMETRES selon votre environnement local.
+# GESTIONCAVE_STOCKAGE=sqlite utilise une base SQLite embarquée (fichier CHEMIN_SQLITE) au lieu du serveur MySQL.
+
+PARAMETRES = {"host": "127.0.0.1", "user": "root", "password": "", "database": "gestioncave"}
+TAILLE_POOL = int(os.environ.get("GESTIONCAVE_TAILLE_POOL", "5"))  # Connexions (MySQL ou SQLite) par processus de l'application
+ATTENTE_POOL_S = float(os.environ.get("GESTIONCAVE_ATTENTE_POOL", "10"))  # Attente maximale d'une connexion libre du pool
+CHEMIN_SQLITE = os.environ.get("GESTIONCAVE_SQLITE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gestioncave.db"))
+
+if os.environ.get("GESTIONCAVE_STOCKAGE", "mysql") == "sqlite":
+    stockage = StockageSQLite(CHEMIN_SQLITE, TAILLE_POOL, ATTENTE_POOL_S)
+else:
+    stockage = StockageMySQL(PARAMETRES, TAILLE_POOL, ATTENTE_POOL_S)
 
-# Ce module centralise la connexion MySQL.
-# Adapter les paramètres dans DB(...) selon votre environnement local.
 
 class DB:
-    def __init__(self, host="127.0.0.1", user="root", password="", database="gestioncave"):
-        # Établit la connexion à la base de données
-        self.conn = mysql.connector.connect(
-            host=host,
-            user=user,
-            password=password,
-            database=database,
-            autocommit=True
-        )
+    def __init__(self):
+        # Établit une connexion dédiée (scripts, worker.py)
+        self.conn = stockage.connecter()
+
+
+def connexion_requete():
+    # Connexion réservée à la requête HTTP en cours (rendue par liberer_connexion_requete)
+    if "conn" not in g:
+        g.conn = stockage.emprunter()
+    return g.conn
+
+
+def liberer_connexion_requete(exc=None):
+    # Rend la connexion de la requête, s'il y en a une
+    conn = g.pop("conn", None)
+    if conn is not None:
+        stockage.rendre(conn)
@@ -1,11 +1,15 @@
+import sqlite3
 import mysql.connector
+from db import CHEMIN_SQLITE, PARAMETRES, stockage
+from schema import ddl_mysql, ddl_sqlite
+from stockage import StockageSQLite
 
 # Script d'initialisation de la base de données
-# Crée la base de données vierge avec toutes les tables nécessaires
+# Crée la base de données vierge avec toutes les tables nécessaires (MySQL, ou SQLite si GESTIONCAVE_STOCKAGE=sqlite)
 
-def init_database(host="127.0.0.1", user="root", password="", database="gestioncave"):
+def init_database(host=PARAMETRES["host"], user=PARAMETRES["user"], password=PARAMETRES["password"], database=PARAMETRES["database"]):
     """
-    Initialise la base de données en créant la base et toutes les tables nécessaires.
+    Initialise la base de données MySQL en créant la base et toutes les tables nécessaires.
     """
     try:
         conn = mysql.connector.connect(
@@ -40,88 +44,11 @@ def init_database(host="127.0.0.1", user="root", password="", database="gestionc
         
         print("Création des tables...")
         
-        # Table utilisateur
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS `utilisateur` (
-                `id` int NOT NULL AUTO_INCREMENT,
-                `nom` varchar(100) NOT NULL,
-                `prenom` varchar(100) NOT NULL,
-                `mot_de_passe` varchar(255) NOT NULL,
-                PRIMARY KEY (`id`)
-            ) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        print("  ✓ Table 'utilisateur' créée")
-        
-        # Table cave
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS `cave` (
-                `id` int NOT NULL AUTO_INCREMENT,
-                `nom` varchar(100) NOT NULL,
-                `id_utilisateur` int NOT NULL,
-                PRIMARY KEY (`id`),
-                KEY `id_utilisateur` (`id_utilisateur`)
-            ) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        print("  ✓ Table 'cave' créée")
-        
-        # Table etagere
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS `etagere` (
-                `id` int NOT NULL AUTO_INCREMENT,
-                `nom` varchar(100) NOT NULL,
-                `capacite` int NOT NULL,
-                `id_cave` int NOT NULL,
-                PRIMARY KEY (`id`),
-                KEY `id_cave` (`id_cave`)
-            ) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        print("  ✓ Table 'etagere' créée")
-        
-        # Table bouteille
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS `bouteille` (
-                `id` int NOT NULL AUTO_INCREMENT,
-                `domaine_viticole` varchar(150) NOT NULL,
-                `nom` varchar(150) NOT NULL,
-                `type` enum('Rouge','Blanc','Rosé','Champagne') NOT NULL,
-                `annee` int NOT NULL,
-                `region` varchar(100) DEFAULT NULL,
-                `photo_etiquette` varchar(255) DEFAULT NULL,
-                `prix` decimal(6,2) DEFAULT NULL,
-                PRIMARY KEY (`id`)
-            ) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        print("  ✓ Table 'bouteille' créée")
-        
-        # Table bouteille_cave
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS `bouteille_cave` (
-                `id` int NOT NULL AUTO_INCREMENT,
-                `id_bouteille` int NOT NULL,
-                `id_etagere` int NOT NULL,
-                `date_mise_en_cave` date NOT NULL DEFAULT (curdate()),
-                PRIMARY KEY (`id`),
-                KEY `id_bouteille` (`id_bouteille`),
-                KEY `id_etagere` (`id_etagere`)
-            ) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        print("  ✓ Table 'bouteille_cave' créée")
-        
-        # Table bouteille_archivee
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS `bouteille_archivee` (
-                `id` int NOT NULL AUTO_INCREMENT,
-                `id_bouteille` int NOT NULL,
-                `id_utilisateur` int NOT NULL,
-                `date_archivage` date NOT NULL DEFAULT (curdate()),
-                `note` float DEFAULT NULL,
-                `commentaire` text,
-                PRIMARY KEY (`id`),
-                KEY `id_bouteille` (`id_bouteille`),
-                KEY `id_utilisateur` (`id_utilisateur`)
-            ) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        print("  ✓ Table 'bouteille_archivee' créée")
+        # Tables et index générés depuis schema.py (même définition que pour SQLite)
+        for table, instructions in ddl_mysql():
+            for sql in instructions:
+                cursor.execute(sql)
+            print(f"  ✓ Table '{table}' créée")
         
         conn.commit()
         cursor.close()
@@ -136,7 +63,7 @@ def init_database(host="127.0.0.1", user="root", password="", database="gestionc
         print(f"\nERREUR MySQL: {e}")
         print("\nVérifiez que:")
         print("  - MySQL est démarré")
-        print("  - Les paramètres de connexion sont corrects dans init_db.py")
+        print("  - Les paramètres de connexion sont corrects dans db.py (PARAMETRES)")
         print("  - L'utilisateur a les droits de création de base de données")
         return False
     except Exception as e:
@@ -144,14 +71,37 @@ def init_database(host="127.0.0.1", user="root", password="", database="gestionc
         return False
 
 
+def init_database_sqlite(chemin=CHEMIN_SQLITE):
+    """
+    Initialise la base SQLite embarquée (fichier créé s'il n'existe pas) avec toutes les tables nécessaires.
+    """
+    try:
+        print(f"Base SQLite: {chemin}")
+        conn = StockageSQLite(chemin).connecter()  # active aussi le mode WAL, conservé dans le fichier
+        print("Création des tables...")
+        for table, instructions in ddl_sqlite():
+            for sql in instructions:
+                conn.execute(sql)
+            print(f"  ✓ Table '{table}' créée")
+        conn.close()
+        
+        print()
+        print(f"Initialisation terminée avec succès !")
+        print(f"La base SQLite '{chemin}' est prête à être utilisée.")
+        return True
+    except sqlite3.Error as e:
+        print(f"\nERREUR SQLite: {e}")
+        return False
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("Script d'initialisation de la base de données")
     print("=" * 60)
     print()
     
-    # Utiliser les mêmes paramètres par défaut que db.py
-    success = init_database()
+    # Utiliser le moteur et les paramètres de db.py
+    success = init_database_sqlite() if stockage.nom == "sqlite" else init_database()
     
     if success:
         print()
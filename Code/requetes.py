@@ -0,0 +1,226 @@
+import threading
+import time
+from db import stockage
+
+# Registre central des requêtes SQL nommées utilisées par GestionCave.py.
+# Les requêtes lourdes (PREPAREES) sont préparées une seule fois par connexion MySQL (protocole binaire)
+# puis réexécutées avec de nouveaux paramètres: la base n'a plus à réanalyser ni replanifier leur texte.
+# SQLite garde en cache les requêtes compilées de chaque connexion, quelles qu'elles soient.
+# Les requêtes sont écrites en syntaxe MySQL; le moteur SQLite les traduit (stockage.py).
+
+# Aperçu des caves: nombre d'étagères, capacité, nombre de bouteilles et valeur par cave, en une seule requête.
+# Les agrégats sont calculés dans deux tables dérivées (une ligne par cave) pour éviter de multiplier
+# les étagères par les bouteilles; {filtre} restreint les caves agrégées (toutes, ou celles d'un utilisateur).
+_APERCU_CAVES = """
+    SELECT c.id, c.nom, c.id_utilisateur,
+           COALESCE(e.nb_etageres, 0) AS nb_etageres,
+           COALESCE(e.capacite_totale, 0) AS capacite_totale,
+           COALESCE(bt.nb_bouteilles, 0) AS nb_bouteilles,
+           COALESCE(bt.valeur_totale, 0) AS valeur_totale
+    FROM cave c
+    LEFT JOIN (
+        SELECT id_cave, COUNT(*) AS nb_etageres, SUM(capacite) AS capacite_totale
+        FROM etagere
+        WHERE id_cave IN (SELECT id FROM cave c {filtre})
+        GROUP BY id_cave
+    ) e ON e.id_cave = c.id
+    LEFT JOIN (
+        SELECT et.id_cave, COUNT(*) AS nb_bouteilles, SUM(b.prix) AS valeur_totale
+        FROM bouteille_cave bc
+        JOIN bouteille b ON b.id = bc.id_bouteille
+        JOIN etagere et ON et.id = bc.id_etagere
+        WHERE et.id_cave IN (SELECT id FROM cave c {filtre})
+        GROUP BY et.id_cave
+    ) bt ON bt.id_cave = c.id
+    {filtre}
+    ORDER BY c.nom
+"""
+
+REQUETES = {
+    # utilisateur
+    "utilisateur.par_identifiants": "SELECT * FROM utilisateur WHERE nom=%s AND prenom=%s AND mot_de_passe=%s",
+    "utilisateur.inserer": "INSERT INTO utilisateur (nom, prenom, mot_de_passe) VALUES (%s, %s, %s)",
+
+    # cave
+    "cave.inserer": "INSERT INTO cave (nom, id_utilisateur) VALUES (%s, %s)",
+    "cave.par_id": "SELECT * FROM cave WHERE id=%s",
+    "cave.apercu_par_utilisateur": _APERCU_CAVES.format(filtre="WHERE c.id_utilisateur=%s"),
+    "cave.apercu_toutes": _APERCU_CAVES.format(filtre=""),
+
+    # etagere
+    "etagere.par_cave": "SELECT * FROM etagere WHERE id_cave=%s",
+    "etagere.inserer": "INSERT INTO etagere (nom, capacite, id_cave) VALUES (%s, %s, %s)",
+    "etagere.supprimer": "DELETE FROM etagere WHERE id=%s",
+    "etagere.compter_par_cave": "SELECT COUNT(*) AS nb FROM etagere WHERE id_cave=%s",
+    "etagere.existe_dans_cave": "SELECT id FROM etagere WHERE id=%s AND id_cave=%s",
+    "etagere.capacite": "SELECT capacite FROM etagere WHERE id=%s",
+    "etagere.compter_bouteilles": "SELECT COUNT(*) AS nb FROM bouteille_cave WHERE id_etagere=%s",
+
+    # bouteille
+    "bouteille.inserer": "INSERT INTO bouteille (domaine_viticole, nom, type, annee, region, photo_etiquette, prix) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+
+    # bouteille_cave
+    "bouteille_cave.inserer": "INSERT INTO bouteille_cave (id_bouteille, id_etagere, date_mise_en_cave) VALUES (%s, %s, %s)",
+    "bouteille_cave.groupes_par_cave": """
+        SELECT
+          b.domaine_viticole,
+          b.nom,
+          b.type,
+          b.annee,
+          b.region,
+          MIN(b.photo_etiquette) AS photo_etiquette,
+          e.nom AS etagere_nom,
+          COUNT(*) AS quantite
+        FROM bouteille_cave bc
+        JOIN bouteille b ON b.id = bc.id_bouteille
+        JOIN etagere e ON e.id = bc.id_etagere
+        WHERE e.id_cave=%s
+        GROUP BY b.domaine_viticole, b.nom, b.type, b.annee, b.region, e.nom
+        ORDER BY b.nom, b.annee, e.nom
+    """,
+    "bouteille_cave.pour_archivage": """
+        SELECT b.*, bc.id AS bc_id
+        FROM bouteille_cave bc
+        JOIN bouteille b ON b.id = bc.id_bouteille
+        JOIN etagere e ON e.id = bc.id_etagere
+        WHERE e.id_cave=%s AND b.domaine_viticole=%s AND b.nom=%s AND b.type=%s AND b.annee=%s AND (b.region=%s OR (b.region IS NULL AND %s IS NULL))
+        LIMIT %s
+    """,
+    "bouteille_cave.pour_suppression": """
+        SELECT bc.id AS bc_id
+        FROM bouteille_cave bc
+        JOIN bouteille b ON b.id = bc.id_bouteille
+        JOIN etagere e ON e.id = bc.id_etagere
+        WHERE e.id_cave=%s AND b.domaine_viticole=%s AND b.nom=%s AND b.type=%s AND b.annee=%s AND (b.region=%s OR (b.region IS NULL AND %s IS NULL))
+        LIMIT %s
+    """,
+    "bouteille_cave.pour_deplacement": """
+        SELECT bc.id AS bc_id
+        FROM bouteille_cave bc
+        JOIN bouteille b ON b.id = bc.id_bouteille
+        JOIN etagere e ON e.id = bc.id_etagere
+        WHERE e.id_cave=%s AND b.domaine_viticole=%s AND b.nom=%s AND b.type=%s AND b.annee=%s AND (b.region=%s OR (b.region IS NULL AND %s IS NULL))
+          AND bc.id_etagere<>%s
+        LIMIT %s
+    """,
+    "bouteille_cave.supprimer": "DELETE FROM bouteille_cave WHERE id=%s",
+    "bouteille_cave.deplacer": "UPDATE bouteille_cave SET id_etagere=%s WHERE id=%s",
+
+    # bouteille_archivee
+    "bouteille_archivee.inserer": "INSERT INTO bouteille_archivee (id_bouteille, id_utilisateur, date_archivage, note, commentaire) VALUES (%s, %s, %s, %s, %s)",
+    "bouteille_archivee.resume_avis": """
+        SELECT AVG(ba.note) AS moyenne, COUNT(*) AS nb_avis
+        FROM bouteille_archivee ba
+        JOIN bouteille b ON b.id = ba.id_bouteille
+        WHERE b.domaine_viticole=%s AND b.nom=%s AND b.type=%s AND b.annee=%s AND (b.region=%s OR (b.region IS NULL AND %s IS NULL))
+    """,
+    "bouteille_archivee.avis_detail": """
+        SELECT ba.note, ba.commentaire
+        FROM bouteille_archivee ba
+        JOIN bouteille b ON b.id = ba.id_bouteille
+        WHERE b.domaine_viticole=%s AND b.nom=%s AND b.type=%s AND b.annee=%s AND (b.region=%s OR (b.region IS NULL AND %s IS NULL))
+        ORDER BY ba.date_archivage DESC
+    """,
+    "bouteille_archivee.groupes_avis": """
+        SELECT b.domaine_viticole, b.nom, b.type, b.annee, b.region, MIN(b.photo_etiquette) AS photo_etiquette,
+               AVG(ba.note) AS moyenne, COUNT(*) AS nb_avis
+        FROM bouteille_archivee ba
+        JOIN bouteille b ON b.id = ba.id_bouteille
+        GROUP BY b.domaine_viticole, b.nom, b.type, b.annee, b.region
+        ORDER BY b.nom, b.annee
+    """,
+
+    # tache
+    # Doublon de clé d'idempotence: aucune insertion (contrairement à INSERT IGNORE, les autres erreurs restent des erreurs)
+    "tache.inserer": "INSERT INTO tache (type, parametres, cle_idempotence, id_utilisateur, total, date_execution, date_maj) VALUES (%s, %s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id)",
+    "tache.par_cle": "SELECT id FROM tache WHERE cle_idempotence=%s",
+    "tache.par_id": "SELECT * FROM tache WHERE id=%s",
+    "tache.prochaine": "SELECT id FROM tache WHERE statut='en_attente' AND date_execution<=%s ORDER BY id LIMIT 1",
+    "tache.reserver": "UPDATE tache SET statut='en_cours', id_worker=%s, tentatives=tentatives+1, date_maj=%s WHERE id=%s AND statut='en_attente'",
+    "tache.progression": "UPDATE tache SET progression=%s, date_maj=%s WHERE id=%s",
+    "tache.terminer": "UPDATE tache SET statut='terminee', erreur=NULL, date_maj=%s WHERE id=%s",
+    "tache.reessayer": "UPDATE tache SET statut='en_attente', erreur=%s, date_execution=%s, date_maj=%s WHERE id=%s",
+    "tache.abandonner": "UPDATE tache SET statut='echouee', erreur=%s, date_maj=%s WHERE id=%s",
+    "tache.reprendre_bloquees": "UPDATE tache SET statut='en_attente', id_worker=NULL, date_execution=%s WHERE statut='en_cours' AND date_maj<%s",
+}
+
+# Requêtes exécutées en instructions préparées sous MySQL: lectures à jointures multiples et agrégats,
+# dont l'analyse et la planification dominent le coût. mysql.connector envoie COM_STMT_RESET avant chaque
+# exécution préparée, soit un aller-retour de plus: les recherches simples (par id, COUNT sur index)
+# et les écritures restent en protocole texte, en un seul aller-retour.
+PREPAREES = frozenset({
+    "cave.apercu_par_utilisateur",
+    "cave.apercu_toutes",
+    "bouteille_cave.groupes_par_cave",
+    "bouteille_cave.pour_archivage",
+    "bouteille_cave.pour_suppression",
+    "bouteille_cave.pour_deplacement",
+    "bouteille_archivee.resume_avis",
+    "bouteille_archivee.avis_detail",
+    "bouteille_archivee.groupes_avis",
+})
+
+# Variantes propres à un moteur, pour les requêtes dont la syntaxe MySQL n'a pas de traduction directe
+VARIANTES = {
+    "sqlite": {
+        "tache.inserer": "INSERT INTO tache (type, parametres, cle_idempotence, id_utilisateur, total, date_execution, date_maj) VALUES (%s, %s, %s, %s, %s, %s, %s) ON CONFLICT(cle_idempotence) DO NOTHING",
+    },
+}
+
+
+class RegistreRequetes:
+    # Exécute les requêtes nommées via le moteur de stockage actif et mesure les exécutions.
+    def __init__(self, requetes: dict, stockage, variantes: dict = None, preparees=()):
+        self.requetes = dict(requetes, **(variantes or {}).get(stockage.nom, {}))
+        self.stockage = stockage
+        self.preparees = frozenset(preparees)
+        self._verrou = threading.Lock()
+        self._stats = {nom: {"executions": 0, "duree_totale_ms": 0.0, "duree_max_ms": 0.0} for nom in requetes}
+
+    def preparer(self, conn) -> int:
+        # Prépare à l'avance les requêtes préparées de lecture sur une connexion (préchauffage au démarrage).
+        # Elles sont exécutées avec des paramètres NULL (et LIMIT 0), ce qui ne lit aucune ligne.
+        # Ces exécutions passent directement par le moteur: elles ne sont pas comptées dans les statistiques.
+        n = 0
+        for nom, sql in self.requetes.items():
+            if nom not in self.preparees or not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            params = [None] * sql.count("%s")
+            if sql.rstrip().upper().endswith("LIMIT %S"):
+                params[-1] = 0
+            self.stockage.executer(conn, sql, tuple(params), preparee=True).fetchall()
+            n += 1
+        return n
+
+    def executer(self, conn, nom: str, params=()):
+        # Exécute la requête nommée et renvoie le curseur (lignes, rowcount, lastrowid).
+        debut = time.perf_counter()
+        try:
+            return self.stockage.executer(conn, self.requetes[nom], params, preparee=nom in self.preparees)
+        finally:
+            duree_ms = (time.perf_counter() - debut) * 1000
+            with self._verrou:
+                s = self._stats[nom]
+                s["executions"] += 1
+                s["duree_totale_ms"] += duree_ms
+                s["duree_max_ms"] = max(s["duree_max_ms"], duree_ms)
+
+    def lignes(self, conn, nom: str, params=()) -> list:
+        # Toutes les lignes (dictionnaires) d'une requête de lecture.
+        return self.executer(conn, nom, params).fetchall()
+
+    def ligne(self, conn, nom: str, params=()):
+        # Première ligne d'une requête de lecture, ou None (le reste est consommé pour libérer la connexion).
+        rows = self.lignes(conn, nom, params)
+        return rows[0] if rows else None
+
+    def statistiques(self) -> dict:
+        # Nombre d'exécutions et durées (ms, côté client) par requête, pour ce processus.
+        with self._verrou:
+            return {
+                nom: dict(s, duree_moyenne_ms=s["duree_totale_ms"] / s["executions"], preparee=nom in self.preparees)
+                for nom, s in self._stats.items() if s["executions"]
+            }
+
+
+registre = RegistreRequetes(REQUETES, stockage, VARIANTES, PREPAREES)
@@ -0,0 +1,146 @@
+# Schéma de la base de données, décrit une seule fois et traduit en DDL MySQL ou SQLite.
+# Chaque colonne est (nom, type, défaut): les types se terminant par "?" acceptent NULL;
+# "id" désigne la clé primaire auto-incrémentée. Les index sont (nom, colonnes, unique).
+
+TABLES = {
+    "utilisateur": {
+        "colonnes": [
+            ("id", "id", None),
+            ("nom", "varchar(100)", None),
+            ("prenom", "varchar(100)", None),
+            ("mot_de_passe", "varchar(255)", None),
+        ],
+        "index": [],
+    },
+    "cave": {
+        "colonnes": [
+            ("id", "id", None),
+            ("nom", "varchar(100)", None),
+            ("id_utilisateur", "int", None),
+        ],
+        "index": [("id_utilisateur", ["id_utilisateur"], False)],
+    },
+    "etagere": {
+        "colonnes": [
+            ("id", "id", None),
+            ("nom", "varchar(100)", None),
+            ("capacite", "int", None),
+            ("id_cave", "int", None),
+        ],
+        "index": [("id_cave", ["id_cave"], False)],
+    },
+    "bouteille": {
+        "colonnes": [
+            ("id", "id", None),
+            ("domaine_viticole", "varchar(150)", None),
+            ("nom", "varchar(150)", None),
+            ("type", "enum('Rouge','Blanc','Rosé','Champagne')", None),
+            ("annee", "int", None),
+            ("region", "varchar(100)?", None),
+            ("photo_etiquette", "varchar(255)?", None),
+            ("prix", "decimal(6,2)?", None),
+        ],
+        "index": [],
+    },
+    "bouteille_cave": {
+        "colonnes": [
+            ("id", "id", None),
+            ("id_bouteille", "int", None),
+            ("id_etagere", "int", None),
+            ("date_mise_en_cave", "date", "aujourdhui"),
+        ],
+        "index": [("id_bouteille", ["id_bouteille"], False), ("id_etagere", ["id_etagere"], False)],
+    },
+    "bouteille_archivee": {
+        "colonnes": [
+            ("id", "id", None),
+            ("id_bouteille", "int", None),
+            ("id_utilisateur", "int", None),
+            ("date_archivage", "date", "aujourdhui"),
+            ("note", "float?", None),
+            ("commentaire", "text?", None),
+        ],
+        "index": [("id_bouteille", ["id_bouteille"], False), ("id_utilisateur", ["id_utilisateur"], False)],
+    },
+    # File des traitements de fond exécutés par worker.py
+    "tache": {
+        "colonnes": [
+            ("id", "id", None),
+            ("type", "varchar(50)", None),
+            ("parametres", "text", None),
+            ("cle_idempotence", "char(64)?", None),
+            ("id_utilisateur", "int", None),
+            ("statut", "enum('en_attente','en_cours','terminee','echouee')", "'en_attente'"),
+            ("progression", "int", "0"),
+            ("total", "int", "0"),
+            ("tentatives", "int", "0"),
+            ("erreur", "text?", None),
+            ("id_worker", "varchar(64)?", None),
+            ("date_execution", "datetime", None),
+            ("date_maj", "datetime", None),
+        ],
+        "index": [("cle_idempotence", ["cle_idempotence"], True), ("statut_date_execution", ["statut", "date_execution"], False)],
+    },
+}
+
+
+def _colonne_mysql(nom, type_sql, defaut):
+    if type_sql == "id":
+        return f"`{nom}` int NOT NULL AUTO_INCREMENT"
+    nullable = type_sql.endswith("?")
+    type_sql = type_sql.rstrip("?")
+    if defaut == "aujourdhui":
+        defaut = "(curdate())"
+    if nullable:
+        # Les colonnes text n'acceptent pas de DEFAULT sous MySQL: NULL est implicite
+        return f"`{nom}` {type_sql}" + ("" if type_sql == "text" else f" DEFAULT {defaut or 'NULL'}")
+    return f"`{nom}` {type_sql} NOT NULL" + (f" DEFAULT {defaut}" if defaut else "")
+
+
+def _colonne_sqlite(nom, type_sql, defaut):
+    if type_sql == "id":
+        return f"{nom} INTEGER PRIMARY KEY AUTOINCREMENT"
+    nullable = type_sql.endswith("?")
+    type_sql = type_sql.rstrip("?")
+    contrainte = ""
+    if type_sql.startswith("enum("):
+        contrainte = f" CHECK ({nom} IN ({type_sql[5:-1]}))"
+        type_sql = "TEXT"
+    elif type_sql == "int":
+        type_sql = "INTEGER"
+    elif type_sql.startswith("decimal"):
+        type_sql = "NUMERIC"
+    elif type_sql == "float":
+        type_sql = "REAL"
+    else:
+        # varchar, char, text, date et datetime (dates stockées au format ISO)
+        type_sql = "TEXT"
+    if defaut == "aujourdhui":
+        defaut = "(date('now'))"
+    return f"{nom} {type_sql}" + ("" if nullable else " NOT NULL") + (f" DEFAULT {defaut}" if defaut else "") + contrainte
+
+
+def ddl_mysql():
+    # Instructions CREATE TABLE (index inclus) par table, pour MySQL/InnoDB.
+    resultat = []
+    for table, definition in TABLES.items():
+        lignes = [_colonne_mysql(*c) for c in definition["colonnes"]]
+        lignes.append("PRIMARY KEY (`id`)")
+        for nom, colonnes, unique in definition["index"]:
+            lignes.append(f"{'UNIQUE KEY' if unique else 'KEY'} `{nom}` ({', '.join(f'`{c}`' for c in colonnes)})")
+        sql = (f"CREATE TABLE IF NOT EXISTS `{table}` (\n    " + ",\n    ".join(lignes)
+               + "\n) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci")
+        resultat.append((table, [sql]))
+    return resultat
+
+
+def ddl_sqlite():
+    # Instructions CREATE TABLE puis CREATE INDEX par table, pour SQLite.
+    resultat = []
+    for table, definition in TABLES.items():
+        lignes = [_colonne_sqlite(*c) for c in definition["colonnes"]]
+        instructions = [f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ",\n    ".join(lignes) + "\n)"]
+        for nom, colonnes, unique in definition["index"]:
+            instructions.append(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {table}_{nom} ON {table} ({', '.join(colonnes)})")
+        resultat.append((table, instructions))
+    return resultat
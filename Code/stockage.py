@@ -0,0 +1,229 @@
+import os
+import sqlite3
+import threading
+import weakref
+from datetime import date, datetime
+from decimal import Decimal
+import mysql.connector
+from mysql.connector import errors, pooling
+import schema
+
+# Moteurs de stockage sous les classes métier (GestionCave.py).
+# Les requêtes nommées de requetes.py sont écrites une seule fois (paramètres %s);
+# chaque moteur fournit connexions, exécution, transactions et DDL pour sa base.
+# Le moteur actif est choisi dans db.py (variable GESTIONCAVE_STOCKAGE).
+
+
+class StockageMySQL:
+    # Serveur MySQL: pool de connexions par processus; instructions préparées (protocole binaire) pour les requêtes lourdes.
+    nom = "mysql"
+
+    def __init__(self, parametres: dict, taille_pool: int, attente_s: float = 10):
+        self.parametres = parametres
+        self.taille_pool = taille_pool
+        self.attente_s = attente_s  # Attente maximale d'une connexion libre quand toutes sont empruntées
+        self._pool = None
+        self._pool_pid = None
+        self._places = None
+        self._verrou = threading.Lock()
+        self._curseurs = weakref.WeakKeyDictionary()  # connexion -> (session MySQL, {sql: curseur préparé})
+
+    def connecter(self):
+        # Connexion dédiée (scripts, worker.py)
+        return mysql.connector.connect(autocommit=True, **self.parametres)
+
+    def _obtenir_pool(self):
+        # Pool créé à la première utilisation et propre à chaque processus:
+        # un worker forké ne réutilise jamais les sockets MySQL de son parent.
+        # pool_reset_session=False conserve les instructions préparées quand une connexion est rendue au pool.
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._verrou:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = pooling.MySQLConnectionPool(
+                        pool_name=f"gestioncave_{os.getpid()}",
+                        pool_size=self.taille_pool,
+                        pool_reset_session=False,
+                        autocommit=True,
+                        **self.parametres,
+                    )
+                    self._places = threading.BoundedSemaphore(self.taille_pool)
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def emprunter(self):
+        # get_connection() échoue aussitôt ("pool exhausted") quand toutes les connexions sont empruntées:
+        # le sémaphore fait attendre la requête qu'une connexion soit rendue, jusqu'à attente_s secondes.
+        pool = self._obtenir_pool()
+        places = self._places
+        if not places.acquire(timeout=self.attente_s):
+            raise errors.PoolError(f"Aucune connexion libre après {self.attente_s} s (pool de {self.taille_pool})")
+        try:
+            return pool.get_connection()
+        except Exception:
+            places.release()
+            raise
+
+    def rendre(self, conn):
+        try:
+            conn.close()
+        finally:
+            self._places.release()
+
+    @staticmethod
+    def _connexion_reelle(conn):
+        # Une connexion de pool (PooledMySQLConnection) est une enveloppe recréée à chaque emprunt:
+        # les instructions préparées sont rattachées à la connexion MySQL qu'elle contient.
+        return getattr(conn, "_cnx", None) or conn
+
+    def executer(self, conn, sql: str, params=(), preparee: bool = False):
+        # Requête simple (preparee=False): curseur texte, un seul aller-retour (pas de COM_STMT_RESET).
+        if not preparee:
+            cur = conn.cursor(dictionary=True, buffered=True)
+            cur.execute(sql, params)
+            return cur
+        # Un curseur préparé par requête et par connexion: le premier appel prépare l'instruction,
+        # les suivants ne font que l'exécuter. Le texte passé doit être toujours le même objet,
+        # condition pour que mysql.connector réutilise l'instruction au lieu de la repréparer.
+        # Une reconnexion (ping de /sante/pret, pool) ouvre une nouvelle session serveur où les instructions
+        # préparées de l'ancienne n'existent plus: le cache de la connexion est vidé dès que la session change.
+        conn = self._connexion_reelle(conn)
+        session = conn.connection_id
+        entree = self._curseurs.get(conn)
+        if entree is None or entree[0] != session:
+            entree = self._curseurs[conn] = (session, {})
+        curseurs = entree[1]
+        cur = curseurs.get(sql)
+        if cur is None:
+            cur = curseurs[sql] = conn.cursor(prepared=True, dictionary=True)
+        try:
+            cur.execute(sql, params)
+        except Exception:
+            # Curseur inutilisable (connexion perdue...): il sera recréé et repréparé au prochain appel
+            curseurs.pop(sql, None)
+            raise
+        return cur
+
+    def debut_transaction(self, conn):
+        conn.start_transaction()
+
+    def valider(self, conn):
+        conn.commit()
+
+    def annuler(self, conn):
+        conn.rollback()
+
+    def verifier(self, conn):
+        # En cas de reconnexion, les curseurs préparés de la connexion sont recréés au prochain executer()
+        conn.ping(reconnect=True)
+
+    def ddl(self):
+        return schema.ddl_mysql()
+
+
+def _ligne_dict(cur, row):
+    return {col[0]: row[i] for i, col in enumerate(cur.description)}
+
+
+# Dates stockées en texte ISO (comparaisons lexicographiques correctes), prix décimaux en texte numérique
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+sqlite3.register_adapter(Decimal, str)
+
+
+class StockageSQLite:
+    # Base SQLite embarquée (un fichier, sans serveur): WAL et pragmas réglés pour une application web.
+    # Pool borné de connexions par processus, réutilisées d'une requête à l'autre quel que soit le thread:
+    # pragmas appliqués une seule fois et requêtes compilées gardées en cache par chaque connexion.
+    nom = "sqlite"
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",        # lecteurs et écrivain concurrents
+        "PRAGMA synchronous=NORMAL",      # fsync aux checkpoints seulement (sûr en mode WAL)
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-20000",       # 20 Mo de cache de pages
+        "PRAGMA mmap_size=268435456",     # lectures via mmap (256 Mo)
+        "PRAGMA busy_timeout=5000",       # attente d'un verrou d'écriture détenu par un autre processus
+    )
+
+    def __init__(self, chemin: str, taille_pool: int = 5, attente_s: float = 10):
+        self.chemin = chemin
+        self.taille_pool = taille_pool
+        self.attente_s = attente_s
+        self._verrou = threading.Lock()
+        self._pid = None
+        self._libres = []
+        self._places = None
+
+    def connecter(self):
+        # isolation_level=None: mode autocommit, comme les connexions MySQL; transactions explicites via BEGIN.
+        # check_same_thread=False: une connexion du pool sert des threads successifs (jamais deux à la fois).
+        conn = sqlite3.connect(self.chemin, isolation_level=None, cached_statements=256, check_same_thread=False)
+        conn.row_factory = _ligne_dict
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _preparer_processus(self):
+        # Pool propre à chaque processus: un worker forké n'utilise pas les connexions de son parent
+        if self._pid != os.getpid():
+            with self._verrou:
+                if self._pid != os.getpid():
+                    self._libres = []
+                    self._places = threading.BoundedSemaphore(self.taille_pool)
+                    self._pid = os.getpid()
+
+    def emprunter(self):
+        # Connexion libre du pool, ouverte au besoin; au-delà de taille_pool, attend qu'une connexion soit rendue
+        self._preparer_processus()
+        places = self._places
+        if not places.acquire(timeout=self.attente_s):
+            raise sqlite3.OperationalError(f"Aucune connexion libre après {self.attente_s} s (pool de {self.taille_pool})")
+        try:
+            with self._verrou:
+                if self._libres:
+                    return self._libres.pop()
+            return self.connecter()
+        except Exception:
+            places.release()
+            raise
+
+    def rendre(self, conn):
+        # Remet la connexion dans le pool (transaction éventuellement restée ouverte annulée)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._verrou:
+                self._libres.append(conn)
+        finally:
+            self._places.release()
+
+    _traductions = {}
+
+    @classmethod
+    def _traduire(cls, sql: str) -> str:
+        # Syntaxe MySQL des requêtes nommées -> SQLite (calculé une fois par requête)
+        traduit = cls._traductions.get(sql)
+        if traduit is None:
+            traduit = cls._traductions[sql] = sql.replace("%s", "?")
+        return traduit
+
+    def executer(self, conn, sql: str, params=(), preparee: bool = False):
+        # Toutes les requêtes profitent du cache de requêtes compilées de la connexion (preparee sans effet)
+        return conn.execute(self._traduire(sql), params)
+
+    def debut_transaction(self, conn):
+        # IMMEDIATE: le verrou d'écriture est pris dès le début (en attendant au besoin busy_timeout).
+        # Un BEGIN différé qui lit puis écrit échouerait aussitôt ("database is locked")
+        # si une autre connexion avait écrit entre-temps.
+        conn.execute("BEGIN IMMEDIATE")
+
+    def valider(self, conn):
+        conn.execute("COMMIT")
+
+    def annuler(self, conn):
+        conn.execute("ROLLBACK")
+
+    def verifier(self, conn):
+        conn.execute("SELECT 1")
+
+    def ddl(self):
+        return schema.ddl_sqlite()
@@ -0,0 +1,56 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Base commune des tests: moteur SQLite dans un dossier temporaire (aucun serveur MySQL requis).
+# Ce module doit être importé avant ceux de l'application: db.py choisit le moteur à l'import.
+DOSSIER_TESTS = tempfile.mkdtemp(prefix="gestioncave_tests_")
+os.environ["GESTIONCAVE_STOCKAGE"] = "sqlite"
+os.environ["GESTIONCAVE_SQLITE"] = os.path.join(DOSSIER_TESTS, "gestioncave.db")
+os.environ["GESTIONCAVE_PRECHAUFFAGE"] = "0"
+os.environ["GESTIONCAVE_CACHE_JINJA"] = os.path.join(DOSSIER_TESTS, "cache_jinja")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema  # noqa: E402
+from db import stockage  # noqa: E402
+from GestionCave import Bouteille, BouteilleCave, Cave, Etagere, Utilisateur  # noqa: E402
+
+
+def reinitialiser_base():
+    # Recrée toutes les tables vides à partir du schéma
+    conn = stockage.connecter()
+    try:
+        for table in schema.TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        for _, instructions in stockage.ddl():
+            for sql in instructions:
+                conn.execute(sql)
+    finally:
+        conn.close()
+
+
+class TestBase(unittest.TestCase):
+    # Base vide avant chaque test et connexion du pool disponible dans self.conn
+    def setUp(self):
+        reinitialiser_base()
+        self.conn = stockage.emprunter()
+        self.addCleanup(stockage.rendre, self.conn)
+
+    def creer_utilisateur(self, nom="Martin", prenom="Alice", mot_de_passe="secret"):
+        return Utilisateur(nom, prenom, mot_de_passe, conn=self.conn).sauvegarder()
+
+    def creer_cave(self, utilisateur_id, nom="Cave", etageres=(("Haut", 100),)):
+        # Crée une cave et ses étagères (nom, capacité); renvoie (id cave, [ids étagères])
+        cave_id = Cave(nom, utilisateur_id, conn=self.conn).sauvegarder()
+        ids = [Etagere(nom_e, capacite, cave_id, conn=self.conn).sauvegarder() for nom_e, capacite in etageres]
+        return cave_id, ids
+
+    def ajouter_bouteilles(self, etagere_id, quantite, domaine="Domaine", nom="Cuvée", type_vin="Rouge", annee=2020, region="", prix=None):
+        bid = Bouteille(domaine, nom, type_vin, annee, region, prix=prix, conn=self.conn).sauvegarder()
+        for _ in range(quantite):
+            BouteilleCave(domaine, nom, type_vin, annee, region, etagere_id, prix=prix, id_bouteille=bid, conn=self.conn).sauvegarder()
+        return bid
+
+    def compter(self, table):
+        return self.conn.execute(f"SELECT COUNT(*) AS nb FROM {table}").fetchone()["nb"]
@@ -0,0 +1,47 @@
+import unittest
+
+from commun import TestBase
+from GestionCave import Cave
+
+
+class TestApercuCaves(TestBase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.creer_utilisateur("Martin", "Alice")
+        self.bob = self.creer_utilisateur("Durand", "Bob")
+        self.cave_a, (haut, bas) = self.creer_cave(self.alice, "A", (("Haut", 10), ("Bas", 30)))
+        self.ajouter_bouteilles(haut, 3, prix=12.5)
+        self.ajouter_bouteilles(bas, 5, nom="Autre", prix=None)
+        self.ajouter_bouteilles(bas, 2, nom="Troisième", prix=20)
+        self.cave_vide, _ = self.creer_cave(self.alice, "B", ())
+        self.cave_bob, (e,) = self.creer_cave(self.bob, "C", (("Unique", 4),))
+        self.ajouter_bouteilles(e, 4, prix=8)
+
+    def test_indicateurs_par_cave(self):
+        apercu = {c.id_cave: c for c in Cave("", 0, conn=self.conn).obtenir_apercu_toutes()}
+        a = apercu[self.cave_a]
+        self.assertEqual((a.nb_etageres, a.capacite_totale, a.nb_bouteilles), (2, 40, 10))
+        self.assertAlmostEqual(a.valeur_totale, 3 * 12.5 + 2 * 20)
+        self.assertAlmostEqual(a.taux_remplissage, 0.25)
+        c = apercu[self.cave_bob]
+        self.assertEqual((c.nb_etageres, c.nb_bouteilles), (1, 4))
+        self.assertAlmostEqual(c.taux_remplissage, 1.0)
+
+    def test_cave_vide(self):
+        vide = [c for c in Cave("", 0, conn=self.conn).obtenir_apercu_toutes() if c.id_cave == self.cave_vide][0]
+        self.assertEqual((vide.nb_etageres, vide.capacite_totale, vide.nb_bouteilles, vide.valeur_totale), (0, 0, 0, 0.0))
+        self.assertIsNone(vide.taux_remplissage)
+
+    def test_filtre_par_utilisateur_et_tri(self):
+        caves = Cave("", 0, conn=self.conn).obtenir_apercu_par_utilisateur(self.alice)
+        self.assertEqual([c.nom for c in caves], ["A", "B"])
+        self.assertEqual(Cave("", 0, conn=self.conn).obtenir_apercu_par_utilisateur(self.bob)[0].nb_bouteilles, 4)
+
+    def test_en_dict(self):
+        d = Cave("", 0, conn=self.conn).obtenir_apercu_par_utilisateur(self.bob)[0].en_dict()
+        self.assertEqual(d["id"], self.cave_bob)
+        self.assertEqual(d["valeur_totale"], 32.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+
+from commun import TestBase
+from app import create_app
+
+
+class TestOperationsParLots(TestBase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.creer_utilisateur()
+        self.cave_id, (self.haut, self.bas) = self.creer_cave(self.user, etageres=(("Haut", 20), ("Bas", 20)))
+        self.ajouter_bouteilles(self.haut, 5)
+        self.client = create_app().test_client()
+        r = self.client.post("/api/v1/session", json={"nom": "Martin", "prenom": "Alice", "mot_de_passe": "secret"})
+        self.assertEqual(r.status_code, 200)
+        self.lot = {"domaine_viticole": "Domaine", "nom": "Cuvée", "type": "Rouge", "annee": 2020, "region": ""}
+
+    def operations(self, *ops, json=None):
+        return self.client.post(f"/api/v1/caves/{self.cave_id}/operations", json={"operations": list(ops)} if json is None else json)
+
+    def test_lot_valide(self):
+        r = self.operations(
+            dict(self.lot, op="ajouter", etagere_id=self.bas, quantite=3, prix=9.5),
+            dict(self.lot, op="archiver", quantite=2, note=16),
+            dict(self.lot, op="deplacer", etagere_id=self.bas, quantite=2),
+            dict(self.lot, op="supprimer"),
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([res["n"] for res in r.get_json()["resultats"]], [3, 2, 2, 1])
+        self.assertEqual(self.compter("bouteille_cave"), 5)
+        self.assertEqual(self.compter("bouteille_archivee"), 2)
+
+    def test_lot_annule_a_la_premiere_erreur(self):
+        r = self.operations(
+            dict(self.lot, op="ajouter", etagere_id=self.bas, quantite=3),
+            dict(self.lot, op="supprimer", quantite=4),
+            dict(self.lot, op="archiver", quantite=50),
+        )
+        self.assertEqual(r.status_code, 422)
+        resultats = r.get_json()["resultats"]
+        self.assertEqual(len(resultats), 3)
+        self.assertFalse(resultats[-1]["ok"])
+        self.assertEqual(self.compter("bouteille_cave"), 5)
+        self.assertEqual(self.compter("bouteille"), 1)
+
+    def test_deplacer_vers_l_etagere_du_lot(self):
+        # Lot réparti sur deux étagères: seuls les exemplaires d'une autre étagère sont déplacés
+        self.ajouter_bouteilles(self.bas, 3)
+        r = self.operations(dict(self.lot, op="deplacer", etagere_id=self.bas, quantite=5))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.get_json()["resultats"][0]["n"], 5)
+        par_etagere = {row["id_etagere"]: row["nb"] for row in self.conn.execute("SELECT id_etagere, COUNT(*) AS nb FROM bouteille_cave GROUP BY id_etagere")}
+        self.assertEqual(par_etagere, {self.bas: 8})
+        # Plus aucun exemplaire ailleurs que sur la cible: l'opération est refusée au lieu d'annoncer un déplacement
+        r = self.operations(dict(self.lot, op="deplacer", etagere_id=self.bas, quantite=1))
+        self.assertEqual(r.status_code, 422)
+
+    def test_quantite_nulle_refusee(self):
+        r = self.operations(dict(self.lot, op="supprimer", quantite=0))
+        self.assertEqual(r.status_code, 422)
+        self.assertEqual(self.compter("bouteille_cave"), 5)
+
+    def test_capacite_etagere(self):
+        r = self.operations(dict(self.lot, op="ajouter", etagere_id=self.haut, quantite=16))
+        self.assertEqual(r.status_code, 422)
+        self.assertIn("Capacité", r.get_json()["resultats"][0]["erreur"])
+
+    def test_corps_invalide(self):
+        r = self.operations(json=[1, 2])
+        self.assertEqual((r.status_code, r.get_json()["ok"]), (400, False))
+        self.assertEqual(self.operations(json={"operations": []}).status_code, 400)
+
+    def test_operation_inconnue(self):
+        for op in (["x"], {"a": 1}, "inconnue", None):
+            r = self.operations(dict(self.lot, op=op))
+            self.assertEqual(r.status_code, 422)
+            self.assertEqual(r.get_json()["resultats"][0]["erreur"], "Opération inconnue")
+        self.assertEqual(self.operations("pas un objet").status_code, 422)
+
+    def test_champ_non_scalaire_refuse(self):
+        ajout = dict(self.lot, op="ajouter", etagere_id=self.bas)
+        invalides = [
+            dict(ajout, domaine_viticole=["x"]),
+            dict(ajout, region={"a": 1}),
+            dict(ajout, etagere_id=True, quantite=True),
+            dict(ajout, quantite=True),
+            dict(ajout, annee=2020.7),
+            dict(ajout, annee="2020.7"),
+            dict(ajout, annee=10**12),
+            dict(ajout, prix="inf"),
+            dict(ajout, prix="nan"),
+            dict(ajout, prix=float("inf")),
+            dict(ajout, prix=1e12),
+            dict(ajout, prix=-1),
+            dict(self.lot, op="archiver", note=21),
+        ]
+        for op in invalides:
+            r = self.operations(op)
+            self.assertEqual(r.status_code, 422, op)
+            self.assertTrue(r.get_json()["resultats"][0]["erreur"].startswith("Champ invalide"), op)
+        self.assertEqual(self.compter("bouteille"), 1)
+        self.assertEqual(self.compter("bouteille_cave"), 5)
+        # Entiers écrits en flottant ou en texte et prix limite restent acceptés
+        r = self.operations(dict(ajout, annee=2020.0, quantite="2", prix=9999.99))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.client.get("/api/v1/caves").get_json()[0]["valeur_totale"], 2 * 9999.99)
+
+    def test_cave_d_un_autre_utilisateur(self):
+        autre = self.creer_utilisateur("Durand", "Bob")
+        cave_id, _ = self.creer_cave(autre)
+        r = self.client.post(f"/api/v1/caves/{cave_id}/operations", json={"operations": [dict(self.lot, op="supprimer")]})
+        self.assertEqual(r.status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
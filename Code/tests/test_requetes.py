@@ -0,0 +1,63 @@
+import unittest
+
+from requetes import PREPAREES, REQUETES, RegistreRequetes
+from stockage import StockageMySQL
+
+
+class CurseurFactice:
+    def __init__(self, prepare):
+        self.prepare = prepare
+        self.executions = []
+
+    def execute(self, sql, params=()):
+        self.executions.append((sql, params))
+
+    def fetchall(self):
+        return []
+
+
+class ConnexionFactice:
+    # Connexion MySQL simulée: enregistre les curseurs ouverts
+    def __init__(self):
+        self.connection_id = 1
+        self.curseurs = []
+
+    def cursor(self, prepared=False, dictionary=False, buffered=False):
+        cur = CurseurFactice(prepared)
+        self.curseurs.append(cur)
+        return cur
+
+
+class TestRequetesPreparees(unittest.TestCase):
+    def setUp(self):
+        self.moteur = StockageMySQL({}, taille_pool=1)
+        self.registre = RegistreRequetes(REQUETES, self.moteur, preparees=PREPAREES)
+        self.conn = ConnexionFactice()
+
+    def test_requete_simple_en_texte(self):
+        self.registre.executer(self.conn, "cave.par_id", (1,))
+        self.registre.executer(self.conn, "cave.par_id", (2,))
+        self.assertEqual([c.prepare for c in self.conn.curseurs], [False, False])
+
+    def test_requete_lourde_preparee_une_fois(self):
+        self.registre.executer(self.conn, "bouteille_cave.groupes_par_cave", (1,))
+        self.registre.executer(self.conn, "bouteille_cave.groupes_par_cave", (2,))
+        self.assertEqual(len(self.conn.curseurs), 1)
+        self.assertTrue(self.conn.curseurs[0].prepare)
+        self.assertEqual(len(self.conn.curseurs[0].executions), 2)
+
+    def test_nouvelle_session_reprepare(self):
+        self.registre.executer(self.conn, "bouteille_cave.groupes_par_cave", (1,))
+        self.conn.connection_id = 2
+        self.registre.executer(self.conn, "bouteille_cave.groupes_par_cave", (1,))
+        self.assertEqual(len(self.conn.curseurs), 2)
+
+    def test_prechauffage_limite_aux_requetes_preparees(self):
+        n = self.registre.preparer(self.conn)
+        self.assertGreater(n, 0)
+        self.assertTrue(all(c.prepare for c in self.conn.curseurs))
+        self.assertEqual(self.registre.statistiques(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import sqlite3
+import unittest
+
+import commun  # noqa: F401  (moteur SQLite de test)
+import schema
+
+
+class TestDDLSQLite(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        for _, instructions in schema.ddl_sqlite():
+            for sql in instructions:
+                self.conn.execute(sql)
+
+    def test_toutes_les_tables_sont_creees(self):
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        self.assertTrue(set(schema.TABLES) <= tables)
+
+    def test_index_crees(self):
+        index = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        self.assertIn("tache_cle_idempotence", index)
+        self.assertIn("bouteille_cave_id_etagere", index)
+
+    def test_cle_idempotence_unique(self):
+        sql = "INSERT INTO tache (type, parametres, cle_idempotence, id_utilisateur, date_execution, date_maj) VALUES ('archiver', '{}', ?, 1, '2024-01-01', '2024-01-01')"
+        self.conn.execute(sql, ("abc",))
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.conn.execute(sql, ("abc",))
+        # Les clés NULL (tâches terminées) ne sont pas concernées par l'unicité
+        self.conn.execute(sql, (None,))
+        self.conn.execute(sql, (None,))
+
+    def test_enum_verifie(self):
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.conn.execute("INSERT INTO bouteille (domaine_viticole, nom, type, annee) VALUES ('D', 'N', 'Bleu', 2020)")
+
+    def test_valeurs_par_defaut(self):
+        self.conn.execute("INSERT INTO tache (type, parametres, id_utilisateur, date_execution, date_maj) VALUES ('archiver', '{}', 1, '2024-01-01', '2024-01-01')")
+        statut, progression = self.conn.execute("SELECT statut, progression FROM tache").fetchone()
+        self.assertEqual((statut, progression), ("en_attente", 0))
+
+
+class TestDDLMySQL(unittest.TestCase):
+    def setUp(self):
+        self.ddl = dict(schema.ddl_mysql())
+
+    def test_une_instruction_innodb_par_table(self):
+        self.assertEqual(set(self.ddl), set(schema.TABLES))
+        for table, instructions in self.ddl.items():
+            self.assertEqual(len(instructions), 1)
+            self.assertIn(f"CREATE TABLE IF NOT EXISTS `{table}`", instructions[0])
+            self.assertIn("ENGINE=InnoDB", instructions[0])
+            self.assertIn("PRIMARY KEY (`id`)", instructions[0])
+
+    def test_colonnes_et_index(self):
+        tache = self.ddl["tache"][0]
+        self.assertIn("`id` int NOT NULL AUTO_INCREMENT", tache)
+        self.assertIn("UNIQUE KEY `cle_idempotence` (`cle_idempotence`)", tache)
+        self.assertIn("KEY `statut_date_execution` (`statut`, `date_execution`)", tache)
+        self.assertIn("`statut` enum('en_attente','en_cours','terminee','echouee') NOT NULL DEFAULT 'en_attente'", tache)
+        # Colonne text nullable: pas de DEFAULT (refusé par MySQL)
+        self.assertIn("`erreur` text,", tache)
+        self.assertIn("`date_mise_en_cave` date NOT NULL DEFAULT (curdate())", self.ddl["bouteille_cave"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import threading
+import unittest
+
+from commun import TestBase
+from db import stockage
+from stockage import StockageSQLite
+
+
+class TestStockageSQLite(TestBase):
+    def test_connexions_reutilisees(self):
+        moteur = StockageSQLite(stockage.chemin, taille_pool=2)
+        a = moteur.emprunter()
+        moteur.rendre(a)
+        self.assertIs(moteur.emprunter(), a)
+
+    def test_pool_borne(self):
+        moteur = StockageSQLite(stockage.chemin, taille_pool=1, attente_s=0.1)
+        a = moteur.emprunter()
+        with self.assertRaises(Exception):
+            moteur.emprunter()
+        # Une connexion rendue par un autre thread débloque l'attente
+        threading.Timer(0.05, moteur.rendre, (a,)).start()
+        moteur.attente_s = 2
+        self.assertIs(moteur.emprunter(), a)
+
+    def test_transaction_ouverte_annulee_au_retour(self):
+        moteur = StockageSQLite(stockage.chemin, taille_pool=1)
+        conn = moteur.emprunter()
+        moteur.debut_transaction(conn)
+        conn.execute("INSERT INTO utilisateur (nom, prenom, mot_de_passe) VALUES ('a', 'b', 'c')")
+        moteur.rendre(conn)
+        self.assertEqual(self.compter("utilisateur"), 0)
+
+    def test_ecrivains_concurrents(self):
+        # Transaction qui lit puis écrit pendant qu'une autre connexion écrit: l'autre attend au lieu d'échouer
+        moteur = StockageSQLite(stockage.chemin, taille_pool=2)
+        a = moteur.emprunter()
+        moteur.debut_transaction(a)
+        a.execute("SELECT COUNT(*) FROM utilisateur").fetchall()
+        erreurs = []
+
+        def ecrire():
+            b = moteur.emprunter()
+            try:
+                moteur.debut_transaction(b)
+                b.execute("INSERT INTO utilisateur (nom, prenom, mot_de_passe) VALUES ('b', 'b', 'b')")
+                moteur.valider(b)
+            except Exception as e:
+                erreurs.append(e)
+            finally:
+                moteur.rendre(b)
+
+        t = threading.Thread(target=ecrire)
+        t.start()
+        t.join(0.2)
+        a.execute("INSERT INTO utilisateur (nom, prenom, mot_de_passe) VALUES ('a', 'a', 'a')")
+        moteur.valider(a)
+        moteur.rendre(a)
+        t.join()
+        self.assertEqual(erreurs, [])
+        self.assertEqual(self.compter("utilisateur"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
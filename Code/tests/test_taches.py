@@ -0,0 +1,155 @@
+import re
+import unittest
+from unittest import mock
+
+from commun import TestBase
+import worker
+from GestionCave import BouteilleCave, Tache
+
+
+class TestTaches(TestBase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.creer_utilisateur()
+        self.cave_id, (self.etagere_id,) = self.creer_cave(self.user, etageres=(("Haut", 1000),))
+        self.ajouter_bouteilles(self.etagere_id, 200, prix=10)
+        self.parametres = {"cave_id": self.cave_id, "domaine": "Domaine", "nom": "Cuvée", "type": "Rouge", "annee": 2020, "region": ""}
+
+    def mettre_en_file(self, type_tache, total, jeton=None, **parametres):
+        return Tache(type_tache, dict(self.parametres, **parametres), self.user, total=total, jeton=jeton, conn=self.conn).sauvegarder()
+
+    def executer_suivante(self):
+        # Rend la tâche exécutable tout de suite (délai de nouvel essai ignoré) puis l'exécute comme le worker
+        self.conn.execute("UPDATE tache SET date_execution='2000-01-01'")
+        tache = Tache.reserver_suivante(self.conn, "test")
+        self.assertIsNotNone(tache)
+        with mock.patch("traceback.print_exc"):
+            worker.executer_tache(self.conn, tache)
+        return Tache.trouver_par_id(self.conn, tache.id_tache)
+
+    def test_suppression_terminee(self):
+        self.mettre_en_file("supprimer", 120)
+        tache = self.executer_suivante()
+        self.assertEqual((tache.statut, tache.progression), ("terminee", 120))
+        self.assertEqual(self.compter("bouteille_cave"), 80)
+
+    def test_archivage(self):
+        self.mettre_en_file("archiver", 60, note=15.0, commentaire="Très bon")
+        self.assertEqual(self.executer_suivante().statut, "terminee")
+        self.assertEqual(self.compter("bouteille_cave"), 140)
+        self.assertEqual(self.compter("bouteille_archivee"), 60)
+
+    def test_reprise_apres_echec_en_cours_de_lot(self):
+        # Échec sur le 51e exemplaire: le lot interrompu est annulé, la reprise ne supprime que le nécessaire
+        supprimer = BouteilleCave.supprimer_bouteille_cave
+        appels = []
+
+        def supprimer_avec_panne(conn, bc_id):
+            appels.append(bc_id)
+            if len(appels) == 51:
+                raise RuntimeError("panne")
+            supprimer(conn, bc_id)
+
+        self.mettre_en_file("supprimer", 120)
+        with mock.patch.object(BouteilleCave, "supprimer_bouteille_cave", staticmethod(supprimer_avec_panne)):
+            tache = self.executer_suivante()
+            self.assertEqual((tache.statut, tache.progression, tache.tentatives), ("en_attente", 0, 1))
+            self.assertEqual(self.compter("bouteille_cave"), 200)
+            tache = self.executer_suivante()
+        self.assertEqual((tache.statut, tache.progression), ("terminee", 120))
+        self.assertEqual(self.compter("bouteille_cave"), 80)
+
+    def test_progression_conservee_entre_lots(self):
+        # Panne dans le 2e lot: le 1er (100 exemplaires) reste validé avec sa progression
+        supprimer = BouteilleCave.supprimer_bouteille_cave
+        appels = []
+
+        def supprimer_avec_panne(conn, bc_id):
+            appels.append(bc_id)
+            if len(appels) == 110:
+                raise RuntimeError("panne")
+            supprimer(conn, bc_id)
+
+        self.mettre_en_file("supprimer", 150)
+        with mock.patch.object(BouteilleCave, "supprimer_bouteille_cave", staticmethod(supprimer_avec_panne)):
+            tache = self.executer_suivante()
+        self.assertEqual(tache.progression, worker.TAILLE_LOT)
+        self.assertEqual(self.compter("bouteille_cave"), 200 - worker.TAILLE_LOT)
+        self.assertEqual(self.executer_suivante().progression, 150)
+        self.assertEqual(self.compter("bouteille_cave"), 50)
+
+    def test_abandon_apres_max_tentatives(self):
+        self.mettre_en_file("inconnu", 10)
+        for _ in range(worker.MAX_TENTATIVES):
+            tache = self.executer_suivante()
+        self.assertEqual(tache.statut, "echouee")
+        self.assertIn("Type de tâche inconnu", tache.erreur)
+
+    def test_idempotence_par_jeton(self):
+        premiere = self.mettre_en_file("supprimer", 60, jeton="j1")
+        self.assertEqual(self.mettre_en_file("supprimer", 60, jeton="j1"), premiere)
+        self.assertNotEqual(self.mettre_en_file("supprimer", 60, jeton="j2"), premiere)
+        # Sans jeton, chaque soumission crée sa tâche
+        self.assertNotEqual(self.mettre_en_file("supprimer", 60), self.mettre_en_file("supprimer", 60))
+        self.assertEqual(self.compter("tache"), 4)
+
+    def test_renvoi_apres_la_fin(self):
+        # Un formulaire renvoyé après la fin de sa tâche retrouve cette tâche au lieu de la rejouer
+        premiere = self.mettre_en_file("supprimer", 60, jeton="j1")
+        self.assertEqual(self.executer_suivante().statut, "terminee")
+        self.assertEqual(self.mettre_en_file("supprimer", 60, jeton="j1"), premiere)
+        self.assertEqual(self.compter("tache"), 1)
+        self.assertEqual(self.compter("bouteille_cave"), 140)
+
+    def test_insertion_invalide_non_ignoree(self):
+        # Seul le doublon de clé est toléré: une ligne invalide reste une erreur
+        with self.assertRaises(Exception):
+            Tache(None, {}, self.user, total=1, conn=self.conn).sauvegarder()
+        self.assertEqual(self.compter("tache"), 0)
+
+    def test_reprendre_bloquees(self):
+        self.mettre_en_file("supprimer", 60)
+        Tache.reserver_suivante(self.conn, "disparu")
+        self.assertEqual(Tache.reprendre_bloquees(self.conn, 300), 0)
+        self.conn.execute("UPDATE tache SET date_maj='2000-01-01'")
+        self.assertEqual(Tache.reprendre_bloquees(self.conn, 300), 1)
+        self.assertEqual(self.executer_suivante().statut, "terminee")
+
+
+
+class TestFormulairesTaches(TestBase):
+    # Mise en file depuis la page d'une cave: jeton de soumission rendu côté serveur dans les formulaires
+    def setUp(self):
+        super().setUp()
+        from app import create_app
+        user = self.creer_utilisateur()
+        self.cave_id, (etagere_id,) = self.creer_cave(user, etageres=(("Haut", 1000),))
+        self.ajouter_bouteilles(etagere_id, 200)
+        self.client = create_app().test_client()
+        self.client.post("/login", data={"nom": "Martin", "prenom": "Alice", "mot_de_passe": "secret"})
+
+    def formulaire(self):
+        # Champs du formulaire d'archivage tels que rendus dans la page
+        html = self.client.get(f"/caves/{self.cave_id}").get_data(as_text=True)
+        jetons = re.findall(r'name="jeton" value="(\w*)"', html)
+        self.assertEqual(len(jetons), 2)
+        self.assertEqual(len(set(jetons)), 1)
+        self.assertTrue(jetons[0])
+        return {"cave_id": self.cave_id, "domaine_viticole": "Domaine", "nom": "Cuvée", "type": "Rouge", "annee": 2020, "region": "", "quantite": 60, "jeton": jetons[0]}
+
+    def test_jeton_par_affichage(self):
+        premier = self.formulaire()
+        # Ligne servie depuis le cache de fragments: le jeton est tout de même renouvelé
+        self.assertNotEqual(self.formulaire()["jeton"], premier["jeton"])
+
+    def test_renvoi_deduplique_nouvelle_demande_acceptee(self):
+        donnees = self.formulaire()
+        for _ in range(2):
+            self.client.post("/bouteilles/archiver", data=donnees)
+        self.assertEqual(self.compter("tache"), 1)
+        self.client.post("/bouteilles/archiver", data=self.formulaire())
+        self.assertEqual(self.compter("tache"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import argparse
+import os
+import socket
+import time
+import traceback
+from multiprocessing import Process
+
+from db import DB, stockage
+from GestionCave import BouteilleCave, Tache
+
+# Worker des tâches de fond (table tache).
+# Les routes lourdes de app.py mettent une tâche en file et répondent immédiatement;
+# ce script lance un pool de processus qui dépilent la file et exécutent les traitements.
+# Lancement: python worker.py --processus 4
+
+TAILLE_LOT = 100           # Nombre d'exemplaires traités entre deux mises à jour de progression
+MAX_TENTATIVES = 3         # Au-delà, la tâche passe au statut 'echouee'
+DELAI_REESSAI_S = 10       # Délai avant nouvel essai (multiplié par le nombre de tentatives)
+DELAI_BLOCAGE_S = 300      # Une tâche 'en_cours' sans progression depuis ce délai est remise en file
+INTERVALLE_REPRISE_S = 60  # Fréquence de recherche des tâches bloquées (par processus)
+DELAI_RECONNEXION_S = 5    # Attente avant de rouvrir la connexion après une erreur de base
+INTERVALLE_SCRUTATION_S = 1.0
+
+
+def _executer_par_lots(conn, tache: Tache, selectionner, traiter):
+    # Traite la tâche par lots en repartant de la progression enregistrée.
+    # Chaque lot et sa progression sont validés dans la même transaction: un échec en cours de lot
+    # annule aussi les exemplaires déjà traités, et une reprise ne retraite ni n'ajoute d'exemplaires.
+    p = tache.parametres
+    progression = tache.progression
+    while progression < tache.total:
+        lot = min(TAILLE_LOT, tache.total - progression)
+        stockage.debut_transaction(conn)
+        try:
+            rows = selectionner(conn, p["cave_id"], p["domaine"], p["nom"], p["type"], p["annee"], p["region"], lot)
+            n = traiter(conn, rows) if rows else 0
+            if n:
+                Tache.enregistrer_progression(conn, tache.id_tache, progression + n)
+            stockage.valider(conn)
+        except Exception:
+            stockage.annuler(conn)
+            raise
+        if not n:
+            break
+        progression += n
+
+
+def traiter_archivage(conn, tache: Tache):
+    # Archivage en masse (équivalent de /bouteilles/archiver).
+    p = tache.parametres
+    _executer_par_lots(
+        conn, tache, BouteilleCave.selectionner_pour_archivage,
+        lambda c, rows: BouteilleCave.archiver_exemplaires(c, rows, tache.utilisateur_id, p["note"], p["commentaire"]),
+    )
+
+
+def traiter_suppression(conn, tache: Tache):
+    # Suppression en masse (équivalent de /bouteilles/supprimer).
+    _executer_par_lots(conn, tache, BouteilleCave.selectionner_pour_suppression, BouteilleCave.supprimer_exemplaires)
+
+
+# Types de tâches connus: ajouter ici les futurs traitements (imports, recalculs d'agrégats...)
+GESTIONNAIRES = {
+    "archiver": traiter_archivage,
+    "supprimer": traiter_suppression,
+}
+
+
+def executer_tache(conn, tache: Tache):
+    # Exécute une tâche réservée et enregistre son issue (succès, nouvel essai ou échec définitif).
+    try:
+        gestionnaire = GESTIONNAIRES.get(tache.type)
+        if gestionnaire is None:
+            raise ValueError(f"Type de tâche inconnu: {tache.type}")
+        gestionnaire(conn, tache)
+        Tache.terminer(conn, tache.id_tache)
+    except Exception as e:
+        traceback.print_exc()
+        Tache.echouer(conn, tache, f"{type(e).__name__}: {e}", MAX_TENTATIVES, DELAI_REESSAI_S)
+
+
+def _fermer(conn):
+    # Ferme une connexion sans propager l'erreur (connexion déjà perdue)
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def boucle_worker(numero: int):
+    # Boucle d'un processus du pool: une connexion à la base propre à chaque processus.
+    # Une erreur de base (serveur redémarré, connexion coupée) ferme la connexion, qui est rouverte
+    # après DELAI_RECONNEXION_S; une tâche interrompue est remise en file par reprendre_bloquees.
+    id_worker = f"{socket.gethostname()}:{os.getpid()}"
+    conn = None
+    derniere_reprise = 0.0
+    print(f"Worker {numero} démarré ({id_worker})")
+    while True:
+        try:
+            if conn is None:
+                conn = DB().conn
+            if time.monotonic() - derniere_reprise >= INTERVALLE_REPRISE_S:
+                # Reprend les tâches laissées 'en_cours' par un worker arrêté brutalement
+                reprises = Tache.reprendre_bloquees(conn, DELAI_BLOCAGE_S)
+                derniere_reprise = time.monotonic()
+                if reprises:
+                    print(f"{reprises} tâche(s) bloquée(s) remise(s) en file")
+            tache = Tache.reserver_suivante(conn, id_worker)
+            if tache is None:
+                time.sleep(INTERVALLE_SCRUTATION_S)
+                continue
+            executer_tache(conn, tache)
+        except Exception:
+            traceback.print_exc()
+            if conn is not None:
+                _fermer(conn)
+                conn = None
+            time.sleep(DELAI_RECONNEXION_S)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pool de workers des tâches de fond")
+    parser.add_argument("--processus", type=int, default=os.cpu_count() or 2, help="nombre de processus du pool")
+    args = parser.parse_args()
+
+    processus = [Process(target=boucle_worker, args=(i,), daemon=True) for i in range(args.processus)]
+    for p in processus:
+        p.start()
+    try:
+        # Surveille le pool: un processus arrêté (erreur fatale, tué) est relancé
+        while True:
+            for i, p in enumerate(processus):
+                if not p.is_alive():
+                    print(f"Worker {i} arrêté (code {p.exitcode}), relance")
+                    processus[i] = Process(target=boucle_worker, args=(i,), daemon=True)
+                    processus[i].start()
+            time.sleep(INTERVALLE_SCRUTATION_S)
+    except KeyboardInterrupt:
+        print("Arrêt des workers")
+
+
+if __name__ == "__main__":
+    main()